@@ -0,0 +1,83 @@
+"""
+Benchmark ``StellarDataset.as_dataframe`` against building one DataFrame per
+light curve, on a synthetic KeplerQ9-shaped collection.
+
+Usage::
+
+    python benchmarks/bench_as_dataframe.py --n-curves 500 --length 4000
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from stlearn.data import RaggedArray
+from stlearn.data.datasets import KeplerQ9
+
+
+def make_collection(n_curves, length, seed=0):
+    rng = np.random.default_rng(seed)
+    collection = {}
+    id_dict = {}
+    for ty in KeplerQ9.TYPES:
+        sequences = [
+            rng.normal(size=(rng.integers(length // 2, length), 3))
+            for _ in range(n_curves)
+        ]
+        collection[ty] = RaggedArray.from_sequences(sequences)
+        id_dict[ty] = ["{}_{}.txt".format(ty, i) for i in range(n_curves)]
+
+    return collection, id_dict
+
+
+def loop_as_dataframe(collection, id_dict):
+    """Previous implementation: one DataFrame per curve plus nested concat."""
+    df_dict = {}
+    for key in collection:
+        df_dict[key] = []
+        for i, seq in enumerate(collection[key]):
+            df = pd.DataFrame(seq, columns=["time", "flux", "flux_error"])
+            df["id"] = id_dict[key][i].replace(".txt", "")
+            df["type"] = key
+            df_dict[key].append(df)
+
+        df_dict[key] = pd.concat(df_dict[key])
+
+    return pd.concat(df_dict.values())
+
+
+def best_time(func, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-curves", type=int, default=500)
+    parser.add_argument("--length", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    collection, id_dict = make_collection(args.n_curves, args.length)
+    dataset = KeplerQ9()
+    dataset._id_dict = id_dict
+
+    loop = best_time(
+        lambda: loop_as_dataframe(collection, id_dict), args.repeat
+    )
+    vectorized = best_time(
+        lambda: dataset.as_dataframe(collection), args.repeat
+    )
+
+    print("{:<22} {:>8.3f} s".format("per-curve DataFrames", loop))
+    print("{:<22} {:>8.3f} s".format("as_dataframe", vectorized))
+    print("{:<22} {:>8.1f}x".format("speedup", loop / vectorized))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark ``stlearn.features.extract_stellar_features`` against
+``StellarDataset.as_tsfresh`` on a synthetic labelled collection: extraction
+throughput (curves per second) and the cross-validated Cohen's kappa of a
+random forest trained on each feature set.
+
+Usage::
+
+    python benchmarks/bench_native_features.py --n-curves 100 --length 2000
+"""
+import time
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import cohen_kappa_score
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+from tsfresh.feature_extraction import (
+    ComprehensiveFCParameters,
+    EfficientFCParameters,
+    MinimalFCParameters,
+)
+from tsfresh.utilities.dataframe_functions import impute
+from stlearn.data import RaggedArray
+from stlearn.data.datasets.base import StellarDataset
+from stlearn.features import extract_stellar_features
+
+
+TSFRESH_SETTINGS = {
+    "minimal": MinimalFCParameters,
+    "efficient": EfficientFCParameters,
+    "comprehensive": ComprehensiveFCParameters,
+}
+
+
+def make_curve(ty, length, rng):
+    """Light curve of a variability class sampled every 30 minutes."""
+    time = np.arange(length) / 48
+    noise = rng.normal(scale=rng.uniform(5, 20), size=length)
+
+    if ty == "constant":
+        flux = noise
+    elif ty == "pulsator":
+        period = rng.uniform(0.1, 2)
+        phase = 2 * np.pi * time / period
+        flux = rng.uniform(2, 40) * (
+            np.sin(phase) + 0.4 * np.sin(2 * phase + rng.uniform(0, 6))
+        )
+    elif ty == "rotation":
+        period = rng.uniform(3, 15)
+        envelope = 1 + 0.5 * np.sin(2 * np.pi * time / rng.uniform(20, 60))
+        flux = rng.uniform(2, 40) * envelope * np.sin(
+            2 * np.pi * time / period
+        )
+    else:  # eclipsing
+        period = rng.uniform(0.5, 5)
+        phase = (time / period + rng.uniform()) % 1
+        flux = -rng.uniform(5, 80) * (
+            (phase < 0.05) + 0.5 * (np.abs(phase - 0.5) < 0.05)
+        )
+
+    flux = flux + noise
+    return np.column_stack((time, flux, np.full(length, noise.std())))
+
+
+def make_collection(n_curves, length, seed=0):
+    rng = np.random.default_rng(seed)
+    collection = {}
+    for ty in ("constant", "pulsator", "rotation", "eclipsing"):
+        collection[ty] = RaggedArray.from_sequences(
+            [
+                make_curve(ty, rng.integers(length // 2, length), rng)
+                for _ in range(n_curves)
+            ]
+        )
+
+    return collection
+
+
+def as_long_format(collection):
+    frames = []
+    for ty, ragged in collection.items():
+        frame = pd.DataFrame(
+            ragged.data, columns=["time", "flux", "flux_error"]
+        )
+        frame["id"] = np.repeat(
+            ["{}_{}".format(ty, i) for i in range(len(ragged))],
+            ragged.lengths,
+        )
+        frames.append(frame)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def kappa(features, labels, seed=0):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        features = impute(features.astype(np.float64).copy())
+
+    model = RandomForestClassifier(n_estimators=200, random_state=seed)
+    folds = StratifiedKFold(n_splits=5, shuffle=True, random_state=seed)
+    predicted = cross_val_predict(model, features, labels, cv=folds)
+    return cohen_kappa_score(labels, predicted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-curves", type=int, default=100)
+    parser.add_argument("--length", type=int, default=2000)
+    parser.add_argument(
+        "--tsfresh", choices=list(TSFRESH_SETTINGS), default="efficient"
+    )
+    parser.add_argument(
+        "--backend", default="process", help="backend of as_tsfresh"
+    )
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    collection = make_collection(args.n_curves, args.length)
+    labels = np.repeat(list(collection), args.n_curves)
+    n_total = len(labels)
+
+    start = time.perf_counter()
+    native = extract_stellar_features(collection)
+    native_time = time.perf_counter() - start
+    native = pd.concat(native.values(), ignore_index=True)
+
+    long_format = as_long_format(collection)
+    start = time.perf_counter()
+    tsfresh = StellarDataset().as_tsfresh(
+        long_format,
+        backend=args.backend,
+        n_jobs=args.n_jobs,
+        settings=TSFRESH_SETTINGS[args.tsfresh](),
+    )
+    tsfresh_time = time.perf_counter() - start
+    # tsfresh sorts the curves by id
+    tsfresh = tsfresh.loc[long_format["id"].unique()]
+
+    row = "{:<22} {:>10} {:>12} {:>8}"
+    print(row.format("", "features", "curves/s", "kappa"))
+    for name, features, elapsed in (
+        ("native", native, native_time),
+        ("tsfresh " + args.tsfresh, tsfresh, tsfresh_time),
+    ):
+        print(
+            row.format(
+                name,
+                features.shape[1],
+                "{:.1f}".format(n_total / elapsed),
+                "{:.3f}".format(kappa(features, labels)),
+            )
+        )
+    print("{:<22} {:>33.1f}x".format("speedup", tsfresh_time / native_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark ``stlearn.io.read_lightcurve`` against ``numpy.loadtxt`` on
+synthetic KeplerQ9-shaped light curves.
+
+Usage::
+
+    python benchmarks/bench_read_lightcurve.py --n-files 200 --length 4000
+"""
+import time
+import argparse
+import tempfile
+import numpy as np
+
+from pathlib import Path
+from stlearn.io import read_lightcurve
+
+
+def make_files(folder, n_files, length, seed=0):
+    rng = np.random.default_rng(seed)
+    files = []
+    for i in range(n_files):
+        n = rng.integers(length // 2, length)
+        curve = np.column_stack(
+            (
+                np.sort(rng.uniform(0, 90, size=n)),
+                rng.normal(scale=100, size=n),
+                np.abs(rng.normal(scale=10, size=n)),
+            )
+        )
+        path = Path(folder) / "{}.txt".format(i)
+        np.savetxt(path, curve, fmt="%.8f")
+        files.append(path)
+
+    return files
+
+
+def files_per_second(reader, files, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in files:
+            reader(path)
+        best = min(best, time.perf_counter() - start)
+
+    return len(files) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-files", type=int, default=200)
+    parser.add_argument("--length", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    readers = {
+        "numpy.loadtxt": lambda path: np.loadtxt(path, ndmin=2),
+        "read_lightcurve": read_lightcurve,
+    }
+
+    with tempfile.TemporaryDirectory() as folder:
+        files = make_files(folder, args.n_files, args.length)
+        for name, reader in readers.items():
+            rate = files_per_second(reader, files, args.repeat)
+            print("{:<16} {:>10.1f} files/sec".format(name, rate))
+
+
+if __name__ == "__main__":
+    main()
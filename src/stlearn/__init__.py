@@ -6,9 +6,11 @@ build your own models to classify stellar curves.
 """
 # relative imports
 from . import io
+from . import parallel
 from . import utils
 from . import models
 from . import conventions
+from . import features
 
 # versioneer
 from ._version import get_versions
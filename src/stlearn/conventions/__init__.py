@@ -6,4 +6,7 @@ Internal conventions for the library.
 # convention constant from MAD to Sigma. Constant is 1 / norm.ppf(3/4)
 MAD_TO_SIGNMA = 1.482602218505602
 
-from .dataset_classes import KeplerQ9
+# columns of a light curve, in the order they are stored
+LIGHTCURVE_COLUMNS = ("time", "flux", "flux_error")
+
+from .dataset_classes import KeplerQ9, get_codes, get_types
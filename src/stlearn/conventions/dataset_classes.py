@@ -1,3 +1,6 @@
+from typing import Dict, List
+
+
 class KeplerQ9:
     """
     KeplerQ9 dataset types.
@@ -11,3 +14,39 @@ class KeplerQ9:
     CONTACT_ROT = "CONTACT_ROT"
     APERIODIC = "APERIODIC"
     DSCT_BCEP = "DSCT_BCEP"
+
+
+def get_types(classes) -> List[str]:
+    """
+    Get the types defined by a dataset types class, in definition order.
+
+    Parameters
+    ----------
+    classes : type
+        Dataset types class, e.g. KeplerQ9.
+
+    Returns
+    -------
+    list
+    """
+    return [key for key in classes.__dict__ if not key.startswith("__")]
+
+
+def get_codes(classes) -> Dict[str, int]:
+    """
+    Get the integer code of each type defined by a dataset types class.
+
+    Codes follow the definition order of the types, so they are stable
+    across runs and can be used as labels.
+
+    Parameters
+    ----------
+    classes : type
+        Dataset types class, e.g. KeplerQ9.
+
+    Returns
+    -------
+    dict
+        Dictionary whose keys are the types and whose values are the codes.
+    """
+    return {ty: code for code, ty in enumerate(get_types(classes))}
@@ -4,3 +4,4 @@ Utilities related to reading, creating and loading datasets.
 
 from . import datasets
 from . import preprocessing
+from .ragged import RaggedArray
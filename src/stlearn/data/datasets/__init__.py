@@ -4,3 +4,4 @@ Stellar datasets.
 
 from . import base
 from ._datasets import KeplerQ9
+from ._lazy import LazyCollection
@@ -0,0 +1,103 @@
+"""
+Access to light curves stored inside a zip archive, without extracting it.
+"""
+import os
+import zipfile
+import posixpath
+
+from pathlib import Path
+from typing import Dict, List, Union
+from stlearn.io import parse_lightcurve
+
+
+# open archives of the current process, reused across reads, keyed by path
+# with the (pid, inode, mtime, size) they were opened with
+_HANDLES = {}
+
+
+def is_archive(path: Union[Path, str]) -> bool:
+    """Check whether the given path is a zip archive.
+
+    Parameters
+    ----------
+    path : path-like
+
+    Returns
+    -------
+    bool
+    """
+    path = Path(path)
+    return path.is_file() and zipfile.is_zipfile(path)
+
+
+def index_archive(
+    path: Union[Path, str], types: List[str]
+) -> Dict[str, List[str]]:
+    """Index the members of an archive by stellar type.
+
+    A member belongs to a type if its parent directory is named after it, so
+    archives with or without a top-level folder are supported.
+
+    Parameters
+    ----------
+    path : path-like
+        Path of the zip archive.
+    types : list
+        Stellar types to index.
+
+    Returns
+    -------
+    dict
+        Dictionary whose keys are the star type and whose values are the
+        names of the archive members of that type.
+    """
+    members = {ty: [] for ty in types}
+    with zipfile.ZipFile(path) as zfile:
+        for info in zfile.infolist():
+            if info.is_dir():
+                continue
+
+            parent = posixpath.basename(posixpath.dirname(info.filename))
+            if parent in members:
+                members[parent].append(info.filename)
+
+    return members
+
+
+def read_member(path: Union[Path, str], member: str):
+    """Read the light curve stored in a member of an archive.
+
+    Archives are opened once per process and kept open, so reading many
+    members does not parse the central directory again each time. An
+    archive is opened again when its file is replaced or modified, and in
+    forked processes, which must not share the file offset of the parent.
+
+    Parameters
+    ----------
+    path : path-like
+        Path of the zip archive.
+    member : str
+        Name of the member in the archive.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n_timestamps, n_features).
+    """
+    buffer = _get_handle(path).read(member)
+    return parse_lightcurve(buffer, name=member)
+
+
+def _get_handle(path) -> zipfile.ZipFile:
+    """Open archive of the current process, reopened if the file changed."""
+    path = str(path)
+    stat = os.stat(path)
+    key = (os.getpid(), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    owner, handle = _HANDLES.get(path, (None, None))
+    if owner != key:
+        # the old handle is closed once no thread reads from it
+        handle = zipfile.ZipFile(path)
+        _HANDLES[path] = (key, handle)
+
+    return handle
@@ -0,0 +1,181 @@
+"""
+Binary on-disk cache for light curve collections.
+
+Each stellar type is stored in its own folder as three ``.npy`` files:
+
+* ``values.npy``: every light curve of the class stacked row-wise, with shape
+  (n_timestamps_total, n_features).
+* ``offsets.npy``: start of each light curve in ``values``, with one extra
+  trailing element so curve ``i`` is ``values[offsets[i]:offsets[i + 1]]``.
+* ``ids.npy``: file name of each light curve, in the same order.
+* ``sources.json``: name, size and modification stamp of each source file
+  (or archive member) the class was read from. A cache whose sources differ
+  from the current ones is stale and read again.
+
+The files can be opened memory-mapped, so loading a cached dataset is
+near-instant and pages are only read from disk when a curve is accessed.
+"""
+import os
+import json
+import zipfile
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+from stlearn.data.ragged import RaggedArray
+
+
+VALUES_FILE = "values.npy"
+OFFSETS_FILE = "offsets.npy"
+IDS_FILE = "ids.npy"
+SOURCES_FILE = "sources.json"
+
+
+def describe_sources(sources: List) -> List[list]:
+    """Name, size and modification stamp of each source of a class.
+
+    Parameters
+    ----------
+    sources : list
+        Location of each light curve: a path, or a tuple (archive, member)
+        for archives.
+
+    Returns
+    -------
+    list
+        Sorted list of [name, size, stamp]. The stamp is the modification
+        time in nanoseconds of files and the CRC of archive members.
+    """
+    archives: Dict[Path, zipfile.ZipFile] = {}
+    listing = []
+    try:
+        for source in sources:
+            if isinstance(source, tuple):
+                archive, member = source
+                if archive not in archives:
+                    archives[archive] = zipfile.ZipFile(archive)
+                info = archives[archive].getinfo(member)
+                listing.append([member, info.file_size, info.CRC])
+            else:
+                stat = os.stat(source)
+                listing.append(
+                    [Path(source).name, stat.st_size, stat.st_mtime_ns]
+                )
+    finally:
+        for handle in archives.values():
+            handle.close()
+
+    return sorted(listing)
+
+
+def has_class_cache(path: Union[Path, str], listing: List = None) -> bool:
+    """Check whether a complete cache exists for a single stellar type.
+
+    The offsets file is written last, so its presence marks the cache as
+    complete.
+
+    Parameters
+    ----------
+    path : path-like
+        Cache folder of the class.
+    listing : list, optional, default: None
+        Current sources of the class, see ``describe_sources``. If given,
+        a cache written from different sources is not valid.
+
+    Returns
+    -------
+    bool
+    """
+    path = Path(path)
+    complete = all(
+        (path / name).is_file()
+        for name in (VALUES_FILE, IDS_FILE, SOURCES_FILE, OFFSETS_FILE)
+    )
+    if not complete or listing is None:
+        return complete
+
+    with open(path / SOURCES_FILE) as handle:
+        return json.load(handle) == [list(item) for item in listing]
+
+
+def write_class_cache(
+    path: Union[Path, str],
+    sequences: List[np.ndarray],
+    ids: List[str],
+    listing: List = None,
+) -> None:
+    """Write the light curves of a single stellar type to the binary cache.
+
+    Parameters
+    ----------
+    path : path-like
+        Cache folder of the class. It is created if needed.
+    sequences : list or RaggedArray
+        List of numpy arrays of shape (n_timestamps, n_features).
+    ids : list
+        File name of each sequence.
+    listing : list, optional, default: None
+        Sources the sequences were read from, see ``describe_sources``.
+    """
+    if len(sequences) != len(ids):
+        msg = "'sequences' and 'ids' must have the same length."
+        raise ValueError(msg)
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    ragged = RaggedArray.from_sequences(sequences)
+    offsets = ragged.offsets - ragged.offsets[0]
+
+    # an existing cache is incomplete until the new offsets are written
+    try:
+        os.remove(path / OFFSETS_FILE)
+    except FileNotFoundError:
+        pass
+
+    _atomic_save(path / VALUES_FILE, ragged.data)
+    _atomic_save(path / IDS_FILE, np.asarray(ids, dtype=str))
+
+    tmp = path / (SOURCES_FILE + ".tmp")
+    with open(tmp, "w") as handle:
+        json.dump([list(item) for item in listing or []], handle)
+    os.replace(tmp, path / SOURCES_FILE)
+
+    _atomic_save(path / OFFSETS_FILE, offsets)
+
+
+def read_class_cache(
+    path: Union[Path, str], mmap_mode: str = "r"
+) -> Tuple[RaggedArray, List[str]]:
+    """Read the light curves of a single stellar type from the binary cache.
+
+    Parameters
+    ----------
+    path : path-like
+        Cache folder of the class.
+    mmap_mode : str, optional, default: "r"
+        Memory-map mode passed to ``numpy.load``. Use None to load the whole
+        class in memory.
+
+    Returns
+    -------
+    sequences : RaggedArray
+        Sequences of shape (n_timestamps, n_features) backed by the
+        (memory-mapped) values buffer.
+    ids : list
+        File name of each sequence.
+    """
+    path = Path(path)
+    values = np.load(path / VALUES_FILE, mmap_mode=mmap_mode)
+    offsets = np.load(path / OFFSETS_FILE)
+    ids = np.load(path / IDS_FILE).tolist()
+
+    return RaggedArray(values, offsets), ids
+
+
+def _atomic_save(path: Path, array: np.ndarray) -> None:
+    """Save an array so that readers never see a partially written file."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as handle:
+        np.save(handle, array, allow_pickle=False)
+    os.replace(tmp, path)
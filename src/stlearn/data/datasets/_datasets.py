@@ -1,15 +1,39 @@
 import os
+import warnings
+import posixpath
 import numpy as np
+import pandas as pd
 import lightkurve as lk
 
 from pathlib import Path
 from astropy.units import cds
-from multiprocessing import Pool
-from typing import Dict, List
+from typing import Dict, List, Union
+from stlearn.io import read_lightcurve
+from stlearn.parallel import Executor, open_executor, _get_chunksize
 from stlearn.data.datasets.base import StellarDataset
 from tsfresh.utilities.dataframe_functions import impute
+from stlearn.conventions import get_types
 from stlearn.conventions import KeplerQ9 as keplerq9_classes
-from stlearn.data.preprocessing import pad_sequences
+from stlearn.data.ragged import RaggedArray
+from stlearn.data.preprocessing import (
+    bucket_boundaries,
+    bucket_sequences,
+    pad_sequences,
+    padding_overhead,
+    resample_sequences,
+)
+from stlearn.data.datasets._archive import (
+    index_archive,
+    is_archive,
+    read_member,
+)
+from stlearn.data.datasets._lazy import LazyCollection
+from stlearn.data.datasets._cache import (
+    describe_sources,
+    has_class_cache,
+    read_class_cache,
+    write_class_cache,
+)
 
 
 class KeplerBase(StellarDataset):
@@ -18,9 +42,9 @@ class KeplerBase(StellarDataset):
     class.
     """
 
-    TYPES = [
-        key for key in keplerq9_classes.__dict__ if not key.startswith("__")
-    ]
+    TYPES = get_types(keplerq9_classes)
+
+    CACHE_FOLDER = ".stlearn_cache"
 
     def __init__(self):
         super().__init__()
@@ -30,32 +54,97 @@ class KeplerBase(StellarDataset):
         self._name = None
         self._data_collection = None
 
-    def _read_single_class(self, path, n_processes: int) -> list:
+    def _read_classes(self, folder, types, executor: Executor) -> tuple:
         """Helper function.
 
-        Read the light curves of a single stellar type.
+        Read the light curves of several stellar types with a single
+        executor. The files of all classes are submitted together, so workers
+        stay busy across class boundaries.
 
         Parameters
         ----------
-        path : path-like
-            Path where to find the files for the particular class.
-        n_processes : int
-            Number of processes to use.
+        folder : path-like
+            Folder where the dataset is stored, with one subfolder per type,
+            or zip archive of the dataset.
+        types : list
+            Stellar types to read.
+        executor : stlearn.parallel.Executor
+            Backend used to parse the files.
 
         Returns
         -------
-        collection : list
+        collection : dict
+            Dictionary whose keys are the star type and whose values are
+            RaggedArray sequences.
+        id_dict : dict
+            Dictionary whose keys are the star type and whose values are the
+            file name of each sequence.
         """
-        # prepend folder
-        _files = os.listdir(path)
-        files = [path / x for x in _files]
+        id_dict, sources = self._index_files(folder, types)
+        collection = {ty: [None] * len(id_dict[ty]) for ty in types}
+
+        tasks = [
+            (ty, i, source)
+            for ty in types
+            for i, source in enumerate(sources[ty])
+        ]
+        if tasks:
+            chunksize = _get_chunksize(len(tasks), executor.n_workers)
+            results = executor.imap_unordered(
+                _read_task, tasks, chunksize=chunksize
+            )
+            for ty, i, sequence in results:
+                collection[ty][i] = sequence
+
+        collection = {
+            ty: RaggedArray.from_sequences(collection[ty], n_features=3)
+            for ty in types
+        }
+
+        return collection, id_dict
+
+    def _index_files(self, folder, types) -> tuple:
+        """Helper function.
 
-        pool = Pool(n_processes)
-        collection = pool.map(np.loadtxt, files)
-        pool.close()
-        pool.join()
+        List the light curves of several stellar types.
 
-        return collection
+        Parameters
+        ----------
+        folder : path-like
+            Folder where the dataset is stored, with one subfolder per type,
+            or zip archive of the dataset.
+        types : list
+            Stellar types to list.
+
+        Returns
+        -------
+        id_dict : dict
+            Dictionary whose keys are the star type and whose values are the
+            file name of each light curve.
+        sources : dict
+            Dictionary whose keys are the star type and whose values are the
+            location of each light curve: a path, or a tuple (archive,
+            member) for archives.
+        """
+        folder = Path(folder)
+
+        if is_archive(folder):
+            members = index_archive(folder, types)
+            id_dict = {
+                ty: [posixpath.basename(name) for name in members[ty]]
+                for ty in types
+            }
+            sources = {
+                ty: [(folder, name) for name in members[ty]] for ty in types
+            }
+        else:
+            id_dict = {ty: os.listdir(folder / ty) for ty in types}
+            sources = {
+                ty: [folder / ty / name for name in id_dict[ty]]
+                for ty in types
+            }
+
+        return id_dict, sources
 
     def pad_collection(self, collection):
         new_collection = {}
@@ -64,61 +153,437 @@ class KeplerBase(StellarDataset):
 
         return new_collection
 
+    def resample_collection(
+        self, collection, cadence, n_bins=None, statistic="mean"
+    ):
+        """Rebin every sequence of every class onto a uniform time grid.
+
+        Each grid starts at the first timestamp of its sequence, so the
+        output has the same length for all classes and is aligned in time
+        relative to the start of each light curve.
+
+        Parameters
+        ----------
+        collection : dict
+            Dictionary whose keys are the star type and whose values are a
+            list of numpy.array sequences.
+        cadence : float
+            Width of each bin, in days.
+        n_bins : int, optional, default: None
+            Number of bins. If None, enough bins to hold the longest sequence
+            of the collection are used.
+        statistic : str, optional, default: "mean"
+            Aggregation of each bin, either "mean" or "median".
+
+        Returns
+        -------
+        dict
+            Dictionary whose keys are the star type and whose values are
+            arrays of shape (n_sequences, n_bins, 3), see
+            ``stlearn.data.preprocessing.resample_sequences``.
+        """
+        if n_bins is None:
+            baselines = [
+                np.nanmax(sq[:, 0]) - np.nanmin(sq[:, 0])
+                for ty in self.TYPES
+                for sq in collection[ty]
+                if len(sq) > 0
+            ]
+            n_bins = int(np.nanmax(baselines, initial=0) // cadence) + 1
+
+        new_collection = {}
+        for ty in self.TYPES:
+            new_collection[ty] = resample_sequences(
+                collection[ty], cadence, n_bins=n_bins, statistic=statistic
+            )
+
+        return new_collection
+
+    def bucket_collection(self, collection, boundaries=None, n_buckets=4):
+        """Pad each class in batches of sequences of similar length.
+
+        Parameters
+        ----------
+        collection : dict
+            Dictionary whose keys are the star type and whose values are a
+            list of numpy.array sequences.
+        boundaries : array-like, optional, default: None
+            Upper bound (inclusive) of the length of each bucket. Sequences
+            longer than the last boundary go to an extra bucket. If None,
+            boundaries are computed from the quantiles of the lengths of
+            each class.
+        n_buckets : int, optional, default: 4
+            Number of quantile buckets when ``boundaries`` is None.
+
+        Yields
+        ------
+        ty : str
+            Star type of the batch.
+        indices : numpy.ndarray
+            Position of the sequences of the batch within their class.
+        padded : numpy.ndarray
+            Padded sequences of the batch.
+        """
+        for ty in self.TYPES:
+            batches = bucket_sequences(
+                collection[ty], boundaries=boundaries, n_buckets=n_buckets
+            )
+            for indices, padded in batches:
+                yield ty, indices, padded
+
+    def padding_report(
+        self, collection, boundaries=None, n_buckets=4
+    ) -> pd.DataFrame:
+        """Padding overhead of each class with and without bucketing.
+
+        Parameters
+        ----------
+        collection : dict
+            Dictionary whose keys are the star type and whose values are a
+            list of numpy.array sequences.
+        boundaries : array-like, optional, default: None
+            Bucket boundaries, see ``bucket_collection``.
+        n_buckets : int, optional, default: 4
+            Number of quantile buckets when ``boundaries`` is None.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Fraction of the padded tensor taken by padding for each type,
+            when padding to the longest sequence ('before') and when padding
+            per bucket ('after').
+        """
+        report = {}
+        for ty in self.TYPES:
+            lengths = [len(sq) for sq in collection[ty]]
+            ty_boundaries = boundaries
+            if ty_boundaries is None:
+                ty_boundaries = bucket_boundaries(lengths, n_buckets)
+
+            report[ty] = {
+                "before": padding_overhead(lengths),
+                "after": padding_overhead(lengths, ty_boundaries),
+            }
+
+        return pd.DataFrame.from_dict(report, orient="index")
+
     def as_lightkurve(
         self, collection: Dict[str, np.ndarray]
     ) -> Dict[str, List]:
-        if self.__id_dict is None:
+        lk_dict = {key: [] for key in collection}
+        for key, _, lightcurve in self.iter_lightkurve(collection):
+            lk_dict[key].append(lightcurve)
+
+        return lk_dict
+
+    def iter_lightkurve(
+        self,
+        collection: Dict[str, np.ndarray],
+        func=None,
+        backend: Union[str, Executor] = "serial",
+        n_jobs: int = None,
+        chunksize: int = 1,
+    ):
+        """Lazily convert the collection into 'lightkurve.TessLightCurve'.
+
+        Light curves are built one at a time as the generator is consumed,
+        so only the ones in use are kept in memory. If ``func`` is given, it
+        is applied to each light curve and only its result is yielded, which
+        allows to run the conversion and the analysis in worker processes.
+
+        Parameters
+        ----------
+        collection : dict
+            Dictionary whose keys are the star type and whose values are a
+            list of numpy.array sequences.
+        func : callable, optional, default: None
+            Function applied to each light curve. It must be picklable for
+            process based backends.
+        backend : str or stlearn.parallel.Executor, default: "serial"
+            Execution backend used when ``func`` is given. The "serial" and
+            "cluster" backends consume the collection at the pace of the
+            workers, while pool backends queue every light curve upfront.
+        n_jobs : int, optional, default: None
+            Number of workers of a new backend.
+        chunksize : int, optional, default: 1
+            Number of light curves sent to a worker at once.
+
+        Yields
+        ------
+        ty : str
+            Star type.
+        id : str
+            Identifier of the light curve.
+        lightcurve : lightkurve.TessLightCurve or object
+            The light curve, or the result of ``func`` on it. When a parallel
+            backend is used, results are yielded in completion order.
+        """
+        if self._id_dict is None:
             msg = "'get_ids' needs to be called first."
             raise ValueError(msg)
 
-        lk_dict = {}
-        for key in collection:
-            lk_dict[key] = []
-            for i, seq in enumerate(collection[key]):
+        tasks = (
+            (key, self._id_dict[key][i].replace(".txt", ""), seq, func)
+            for key in collection
+            for i, seq in enumerate(collection[key])
+        )
 
-                id = self.__id_dict[key][i].replace(".txt", "")
+        if func is None or backend == "serial":
+            yield from map(_lightkurve_task, tasks)
+            return
 
-                lightcurve = lk.TessLightCurve(
-                    time=seq[:, 0],
-                    flux=seq[:, 1],
-                    flux_err=seq[:, 2],
-                    flux_unit=cds.ppm,
-                    time_format="jd",
-                    time_scale="tdb",
-                    targetid=id,
-                )
+        with open_executor(backend, n_workers=n_jobs) as executor:
+            yield from executor.imap_unordered(
+                _lightkurve_task, tasks, chunksize=chunksize
+            )
 
-                lk_dict[key].append(lightcurve)
+    def get_ids(self, folder):
+        if self._id_dict is None:
+            self._id_dict, _ = self._index_files(folder, self.TYPES)
+
+        return self._id_dict
+
+    def from_folder(
+        self,
+        folder,
+        n_processes=None,
+        cache: bool = True,
+        cache_dir: Union[Path, str] = None,
+        backend: Union[str, Executor] = "process",
+    ):
+        """Read the light curves stored in the given folder.
+
+        The dataset can be either a folder or the zip archive downloaded by
+        ``download``, in which case light curves are parsed straight from the
+        archive without extracting it.
+
+        The first call parses the text files and, if ``cache`` is True,
+        converts every class into a compact binary store. Subsequent calls
+        open that store memory-mapped instead of parsing the text files
+        again, so curves are only read from disk when they are used. The
+        store keeps the name, size and modification time of the files it was
+        built from, and a class is parsed again when they change. If the
+        cache folder cannot be written, a warning is issued and the curves
+        are returned without caching them.
+
+        A dataset is loaded either with this method or with
+        ``lazy_from_folder``; use a new instance to load it the other way.
 
-        return lk_dict
+        Parameters
+        ----------
+        folder : path-like
+            Folder where the dataset is stored, with one subfolder per type,
+            or zip archive of the dataset.
+        n_processes : int, optional, default: None
+            Number of workers to use when parsing text files. If None, the
+            number of CPUs available to the process is used.
+        cache : bool, optional, default: True
+            Whether to read from and write to the binary cache.
+        cache_dir : path-like, optional, default: None
+            Folder of the binary cache. If None, a hidden folder inside
+            ``folder`` (or next to the archive) is used.
+        backend : str or stlearn.parallel.Executor, default: "process"
+            Execution backend used to parse text files. See
+            ``stlearn.parallel``.
 
-    def get_ids(self, folder):
+        Returns
+        -------
+        dict
+            Dictionary whose keys are the star type and whose values are a
+            RaggedArray of sequences of shape (n_timestamps, 3), which can be
+            used as a list of numpy.array.
+        """
         folder = Path(folder)
+        cache_dir = self._get_cache_dir(folder, cache_dir)
+        self._check_mode(lazy=False)
 
-        if self._id_dict is None:
+        if self._data_collection is None:
+            collection = {}
             id_dict = {}
+            to_read = []
+            listings = {}
+            if cache:
+                _, sources = self._index_files(folder, self.TYPES)
+                listings = {
+                    ty: describe_sources(sources[ty]) for ty in self.TYPES
+                }
+
             for ty in self.TYPES:
-                id_dict[ty] = os.listdir(folder / ty)
+                if cache and has_class_cache(cache_dir / ty, listings[ty]):
+                    collection[ty], id_dict[ty] = read_class_cache(
+                        cache_dir / ty
+                    )
+                else:
+                    to_read.append(ty)
+
+            with open_executor(backend, n_workers=n_processes) as executor:
+                read, read_ids = self._read_classes(folder, to_read, executor)
+            for ty in to_read:
+                if not cache:
+                    continue
+                try:
+                    write_class_cache(
+                        cache_dir / ty, read[ty], read_ids[ty], listings[ty]
+                    )
+                except OSError as error:
+                    msg = "Could not write the binary cache in {}: {}"
+                    warnings.warn(msg.format(cache_dir, error))
+                    cache = False
+
+            collection.update(read)
+            id_dict.update(read_ids)
+
+            # keep the order of TYPES
+            collection = {ty: collection[ty] for ty in self.TYPES}
+            id_dict = {ty: id_dict[ty] for ty in self.TYPES}
+
+            self._data_collection = collection
+            self._id_dict = id_dict
+
+        return self._data_collection
+
+    def lazy_from_folder(self, folder, max_bytes: int = 1 << 28):
+        """Index the light curves of the given folder without reading them.
+
+        Light curves are read when accessed and kept in a least-recently-used
+        cache bounded by ``max_bytes``, so datasets that do not fit in memory
+        can be iterated over.
+
+        A dataset is loaded either with this method or with ``from_folder``;
+        use a new instance to load it the other way.
 
-            self.__id_dict = id_dict
-            return self._id_dict
-        else:
-            return self._id_dict
+        Parameters
+        ----------
+        folder : path-like
+            Folder where the dataset is stored, with one subfolder per type,
+            or zip archive of the dataset.
+        max_bytes : int, optional, default: 256 MiB
+            Memory budget of the cache of light curves.
 
-    def from_folder(self, folder, n_processes=8):
-        folder = Path(folder)
+        Returns
+        -------
+        LazyCollection
+            Mapping whose keys are the star type and whose values are
+            sequences of numpy.array of shape (n_timestamps, 3).
+        """
+        self._check_mode(lazy=True)
+        if self._data_collection is None:
+            id_dict, sources = self._index_files(folder, self.TYPES)
+            self._data_collection = LazyCollection(
+                sources, reader=_read_source, max_bytes=max_bytes
+            )
+            self._id_dict = id_dict
+
+        return self._data_collection
 
+    def _check_mode(self, lazy: bool) -> None:
+        """Raise if the dataset was already loaded the other way."""
         if self._data_collection is None:
-            collection = {}
-            for ty in self.TYPES:
-                collection[ty] = self._read_single_class(
-                    path=folder / ty, n_processes=n_processes
-                )
+            return
+
+        if isinstance(self._data_collection, LazyCollection) != lazy:
+            loaded = "lazy_from_folder" if not lazy else "from_folder"
+            msg = (
+                "The dataset was loaded with '{}', use a new instance to "
+                "load it {}."
+            ).format(loaded, "lazily" if lazy else "in memory")
+            raise ValueError(msg)
 
-            self.__data_collection = collection
-            return self.__data_collection
-        else:
-            return self.__data_collection
+    def build_cache(
+        self,
+        folder,
+        n_processes=None,
+        cache_dir: Union[Path, str] = None,
+        backend: Union[str, Executor] = "process",
+    ) -> Path:
+        """Convert the text files of a dataset folder into the binary cache.
+
+        Classes whose cache is up to date with their files are skipped.
+
+        Parameters
+        ----------
+        folder : path-like
+            Folder where the dataset is stored, with one subfolder per type,
+            or zip archive of the dataset.
+        n_processes : int, optional, default: None
+            Number of workers to use when parsing text files. If None, the
+            number of CPUs available to the process is used.
+        cache_dir : path-like, optional, default: None
+            Folder of the binary cache. If None, a hidden folder inside
+            ``folder`` (or next to the archive) is used.
+        backend : str or stlearn.parallel.Executor, default: "process"
+            Execution backend used to parse text files. See
+            ``stlearn.parallel``.
+
+        Returns
+        -------
+        pathlib.Path
+            Folder of the binary cache.
+        """
+        folder = Path(folder)
+        cache_dir = self._get_cache_dir(folder, cache_dir)
+
+        _, sources = self._index_files(folder, self.TYPES)
+        listings = {ty: describe_sources(sources[ty]) for ty in self.TYPES}
+
+        to_read = [
+            ty
+            for ty in self.TYPES
+            if not has_class_cache(cache_dir / ty, listings[ty])
+        ]
+        with open_executor(backend, n_workers=n_processes) as executor:
+            collection, id_dict = self._read_classes(folder, to_read, executor)
+        for ty in to_read:
+            write_class_cache(
+                cache_dir / ty, collection[ty], id_dict[ty], listings[ty]
+            )
+
+        return cache_dir
+
+    def _get_cache_dir(self, folder: Path, cache_dir=None) -> Path:
+        if cache_dir is None and is_archive(folder):
+            return folder.with_name(folder.stem + self.CACHE_FOLDER)
+        if cache_dir is None:
+            return folder / self.CACHE_FOLDER
+
+        return Path(cache_dir)
+
+
+def _read_source(source):
+    """Read a light curve from a path or an (archive, member) tuple."""
+    if isinstance(source, tuple):
+        return read_member(*source)
+
+    return read_lightcurve(source)
+
+
+def _to_lightkurve(seq, id):
+    """Build a 'lightkurve.TessLightCurve' from a sequence."""
+    return lk.TessLightCurve(
+        time=seq[:, 0],
+        flux=seq[:, 1],
+        flux_err=seq[:, 2],
+        flux_unit=cds.ppm,
+        time_format="jd",
+        time_scale="tdb",
+        targetid=id,
+    )
+
+
+def _lightkurve_task(task):
+    """Build the light curve of a task (type, id, sequence, func)."""
+    ty, id, seq, func = task
+    lightcurve = _to_lightkurve(np.asarray(seq), id)
+    if func is not None:
+        lightcurve = func(lightcurve)
+
+    return ty, id, lightcurve
+
+
+def _read_task(task):
+    """Read a single light curve of a pool task (type, index, source)."""
+    ty, i, source = task
+    return ty, i, _read_source(source)
 
 
 class KeplerQ9(KeplerBase):
@@ -0,0 +1,394 @@
+"""
+Caches of tsfresh features.
+
+``FeatureMemo`` keeps the results of several extractions in memory. The
+persistent ``FeatureCache`` stores the features of every curve on disk.
+Features are stored in one folder per extraction settings, named after a hash
+of the settings, the value columns and the tsfresh version. Each extracted
+chunk of light curves is pickled in its own file, one row per curve, indexed
+by a cache key made of the curve id and a hash of its content. A curve is
+therefore only recomputed when its data or the settings change.
+
+The keys of each chunk file are also saved in a small companion file, so
+the chunk files that hold a set of keys are found without reading them.
+Rows superseded by a newer row of the same curve id are dropped by
+``FeatureCache.compact``.
+"""
+import os
+import json
+import time
+import threading
+import uuid
+import hashlib
+import numpy as np
+import pandas as pd
+import tsfresh
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Hashable, Union
+from tsfresh import extract_features
+from stlearn.data.ragged import RaggedArray
+from stlearn.data.datasets._lazy import LazyCollection
+from stlearn.data.datasets._cache import describe_sources
+
+
+# columns of the long format frames that are labels, not signals
+LABEL_COLUMNS = ("type", "type_code")
+
+CHUNK_SUFFIX = ".pkl"
+KEYS_SUFFIX = ".keys.npy"
+
+
+def value_columns(long_format, column_id="id", column_sort="time"):
+    """Columns of a long format frame whose features are extracted."""
+    ignored = {column_id, column_sort, *LABEL_COLUMNS}
+    return [column for column in long_format if column not in ignored]
+
+
+def settings_hash(settings, columns, kind_settings=None) -> str:
+    """Hash of the extraction settings, the value columns and tsfresh version.
+
+    Parameters
+    ----------
+    settings : dict or None
+        tsfresh ``default_fc_parameters``. None stands for tsfresh's default.
+    columns : list
+        Value columns the features are extracted from.
+    kind_settings : dict, optional, default: None
+        tsfresh ``kind_to_fc_parameters``.
+
+    Returns
+    -------
+    str
+    """
+    content = json.dumps(
+        {
+            "settings": None if settings is None else dict(settings),
+            "kind_settings": kind_settings,
+            "columns": list(columns),
+            "tsfresh": tsfresh.__version__,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+
+def curve_keys(
+    long_format: pd.DataFrame, columns, column_id="id", column_sort="time"
+) -> pd.Series:
+    """Cache key of every curve of a long format frame.
+
+    The content of a curve is hashed by hashing its rows, sorted by time, and
+    combining them with their position, for all curves at once.
+
+    Parameters
+    ----------
+    long_format : pandas.DataFrame
+        Long format frame with the light curves.
+    columns : list
+        Value columns of the curves.
+    column_id : str, optional, default: "id"
+    column_sort : str, optional, default: "time"
+
+    Returns
+    -------
+    pandas.Series
+        Key of each curve, indexed by curve id and sorted by it.
+    """
+    frame = long_format[[column_id, column_sort, *columns]]
+    frame = frame.sort_values([column_id, column_sort], kind="stable")
+
+    ids = frame[column_id].to_numpy()
+    rows = pd.util.hash_pandas_object(
+        frame.drop(columns=column_id), index=False
+    ).to_numpy()
+
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    counts = np.diff(np.append(starts, len(ids)))
+    position = np.arange(len(ids)) - np.repeat(starts, counts)
+
+    # uint64 arithmetic wraps around, which is what a hash wants
+    mixed = rows * (2 * position.astype(np.uint64) + 1)
+    hashes = np.add.reduceat(mixed, starts) if len(ids) else mixed
+
+    return pd.Series(
+        [
+            "{}:{:016x}".format(curve, value)
+            for curve, value in zip(ids[starts], hashes)
+        ],
+        index=pd.Index(ids[starts], name=column_id),
+        dtype=object,
+    )
+
+
+def fingerprint(long_format: pd.DataFrame) -> str:
+    """Hash of the content, column names and dtypes of a frame.
+
+    Parameters
+    ----------
+    long_format : pandas.DataFrame
+
+    Returns
+    -------
+    str
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    columns = [[str(col), str(ty)] for col, ty in long_format.dtypes.items()]
+    digest.update(json.dumps(columns).encode())
+    rows = pd.util.hash_pandas_object(long_format, index=False).to_numpy()
+    digest.update(np.ascontiguousarray(rows).tobytes())
+    return digest.hexdigest()
+
+
+def collection_fingerprint(collection, id_dict) -> str:
+    """Hash of the ids and light curves of a collection, read one by one.
+
+    Curves are hashed in place, without copying a whole class. Lazy
+    collections are hashed from the location, size and modification time
+    of their sources, so no curve is read.
+
+    Parameters
+    ----------
+    collection : dict or LazyCollection
+        Dictionary whose keys are the star type and whose values are a
+        sequence of light curves.
+    id_dict : dict
+        File name of each light curve, see ``get_ids``.
+
+    Returns
+    -------
+    str
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for key, sequences in collection.items():
+        names = list(id_dict[key][: len(sequences)])
+        digest.update(json.dumps([str(key), names]).encode())
+
+        if isinstance(collection, LazyCollection):
+            sources = collection.sources[key]
+            listing = [[str(source) for source in sources]]
+            listing.append(describe_sources(sources))
+            digest.update(json.dumps(listing, default=str).encode())
+            continue
+
+        if isinstance(sequences, RaggedArray):
+            digest.update(sequences.offsets - sequences.offsets[0])
+            digest.update(np.ascontiguousarray(sequences.data))
+            continue
+
+        for sequence in sequences:
+            sequence = np.ascontiguousarray(sequence, dtype=np.float64)
+            digest.update(np.int64(len(sequence)))
+            digest.update(sequence)
+
+    return digest.hexdigest()
+
+
+class FeatureMemo:
+    """In-memory cache of feature frames with a memory budget.
+
+    Frames are kept in a least-recently-used order and the least recently
+    used ones are dropped when the total size exceeds ``max_bytes``.
+
+    Parameters
+    ----------
+    max_bytes : int, optional, default: 1 GiB
+        Memory budget of the cache. The most recently stored frame is always
+        kept, even if it exceeds the budget on its own.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30) -> None:
+        if max_bytes < 0:
+            raise ValueError("'max_bytes' must be non-negative.")
+
+        self.max_bytes = max_bytes
+
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        """Cached frame of a key, or None if it is not cached."""
+        with self._lock:
+            if key not in self._cache:
+                self.misses += 1
+                return None
+
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key][0]
+
+    def put(self, key: Hashable, features: pd.DataFrame) -> None:
+        """Store the frame of a key, evicting old frames if needed."""
+        nbytes = int(features.memory_usage(deep=True).sum())
+        with self._lock:
+            if key in self._cache:
+                self._cache_bytes -= self._cache.pop(key)[1]
+
+            self._cache[key] = (features, nbytes)
+            self._cache_bytes += nbytes
+            self._evict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._cache
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def cache_bytes(self) -> int:
+        """Number of bytes currently held by the cache."""
+        return self._cache_bytes
+
+    def clear(self) -> None:
+        """Drop every cached frame."""
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+    def _evict(self) -> None:
+        """Drop least recently used frames until the budget is met."""
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            _, (_, nbytes) = self._cache.popitem(last=False)
+            self._cache_bytes -= nbytes
+
+
+class FeatureCache:
+    """Feature rows of light curves stored on disk, see module docstring.
+
+    Parameters
+    ----------
+    path : path-like
+        Root folder of the cache.
+    key : str
+        Hash of the extraction settings, see ``settings_hash``.
+    """
+
+    def __init__(self, path: Union[Path, str], key: str) -> None:
+        self.path = Path(path) / key
+        self._index = None
+
+    @property
+    def index(self) -> dict:
+        """Chunk file name of each cache key, the newest file if several."""
+        if self._index is None:
+            self._index = {}
+            for name in self._chunk_names():
+                for key in self._chunk_keys(name):
+                    self._index[key] = name
+
+        return self._index
+
+    def load(self, keys=None) -> pd.DataFrame:
+        """Cached feature rows of the given keys, indexed by cache key.
+
+        Only the chunk files holding the keys are read. Keys that are not
+        cached are left out. If ``keys`` is None, every cached row is loaded.
+        """
+        index = self.index
+        if keys is None:
+            keys = index
+
+        wanted = {}
+        for key in dict.fromkeys(keys):
+            if key in index:
+                wanted.setdefault(index[key], []).append(key)
+        if not wanted:
+            return pd.DataFrame()
+
+        chunks = []
+        for name, rows in sorted(wanted.items()):
+            features = pd.read_pickle(self.path / (name + CHUNK_SUFFIX))
+            # a concurrent compaction may have dropped some of the rows
+            chunks.append(features.loc[features.index.intersection(rows)])
+
+        return pd.concat(chunks)
+
+    def write(self, features: pd.DataFrame) -> None:
+        """Store feature rows indexed by cache key as a new chunk file."""
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        # names sort in writing order, newer rows win
+        name = "{:020d}-{}".format(time.time_ns(), uuid.uuid4().hex)
+        keys = np.asarray(features.index, dtype=str)
+        self._write_chunk(name, features, keys)
+
+        index = self.index
+        for key in keys.tolist():
+            index[key] = name
+
+    def compact(self) -> None:
+        """Drop rows superseded by a newer row of the same curve id.
+
+        A curve id keeps the row of its latest content only. Chunk files
+        left without rows are deleted, the others are rewritten.
+        """
+        names = self._chunk_names()
+        latest = {}
+        for name in names:
+            for key in self._chunk_keys(name):
+                latest[key.rsplit(":", 1)[0]] = (key, name)
+        live = set(latest.values())
+
+        for name in names:
+            keys = self._chunk_keys(name)
+            kept = [key for key in keys if (key, name) in live]
+            if len(kept) == len(keys):
+                continue
+
+            if kept:
+                features = pd.read_pickle(self.path / (name + CHUNK_SUFFIX))
+                self._write_chunk(
+                    name, features.loc[kept], np.asarray(kept, dtype=str)
+                )
+            else:
+                # without its keys file, the chunk is no longer indexed
+                os.remove(self.path / (name + KEYS_SUFFIX))
+                os.remove(self.path / (name + CHUNK_SUFFIX))
+
+        self._index = {key: name for key, name in live}
+
+    def _chunk_names(self) -> list:
+        """Names of the complete chunk files, oldest first."""
+        if not self.path.is_dir():
+            return []
+
+        return sorted(
+            file.name[: -len(KEYS_SUFFIX)]
+            for file in self.path.glob("*" + KEYS_SUFFIX)
+        )
+
+    def _chunk_keys(self, name: str) -> list:
+        return np.load(self.path / (name + KEYS_SUFFIX)).tolist()
+
+    def _write_chunk(self, name, features, keys) -> None:
+        """Write a chunk and then its keys, which mark it as complete."""
+        tmp_path = self.path / (name + ".tmp")
+        features.to_pickle(tmp_path)
+        os.replace(tmp_path, self.path / (name + CHUNK_SUFFIX))
+
+        with open(tmp_path, "wb") as handle:
+            np.save(handle, keys, allow_pickle=False)
+        os.replace(tmp_path, self.path / (name + KEYS_SUFFIX))
+
+
+def extract_chunk(task) -> pd.DataFrame:
+    """Extract the features of a chunk of curves in the current process.
+
+    Rows are indexed by the cache keys of the curves, see ``curve_keys``.
+    """
+    chunk, keys, fc_parameters, column_id, column_sort = task
+    features = extract_features(
+        chunk,
+        column_id=column_id,
+        column_sort=column_sort,
+        n_jobs=0,
+        disable_progressbar=True,
+        **fc_parameters,
+    )
+    features.index = keys.loc[features.index].to_numpy()
+    return features
@@ -0,0 +1,149 @@
+"""
+Light curve collections that are loaded on demand.
+"""
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from typing import Callable, Dict, List
+from stlearn.io import read_lightcurve
+
+
+class LazyCollection(Mapping):
+    """Collection of light curves that are only read when accessed.
+
+    It behaves like the dictionary returned by ``get_data_collection``: keys
+    are the star types and values are sequences of numpy arrays. Only the
+    location of each light curve is kept upfront; curves are read on access
+    and kept in a least-recently-used cache shared by all types, whose total
+    size is bounded by ``max_bytes``.
+
+    Parameters
+    ----------
+    sources : dict
+        Dictionary whose keys are the star type and whose values are the
+        location of each light curve.
+    reader : callable, optional, default: stlearn.io.read_lightcurve
+        Function that reads the light curve of a location.
+    max_bytes : int, optional, default: 256 MiB
+        Memory budget of the cache. The most recently used light curve is
+        always kept, even if it exceeds the budget on its own.
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, List],
+        reader: Callable = read_lightcurve,
+        max_bytes: int = 1 << 28,
+    ) -> None:
+        if max_bytes < 0:
+            raise ValueError("'max_bytes' must be non-negative.")
+
+        self.sources = sources
+        self.reader = reader
+        self.max_bytes = max_bytes
+
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._sequences = {ty: LazySequence(self, ty) for ty in sources}
+
+    def __getitem__(self, ty: str) -> "LazySequence":
+        return self._sequences[ty]
+
+    def __iter__(self):
+        return iter(self._sequences)
+
+    def __len__(self) -> int:
+        return len(self._sequences)
+
+    def load(self, ty: str, i: int) -> np.ndarray:
+        """Get a light curve, reading it if it is not cached.
+
+        Parameters
+        ----------
+        ty : str
+            Star type.
+        i : int
+            Position of the light curve within its type.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        key = (ty, i)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+
+            self.misses += 1
+
+        sequence = self.reader(self.sources[ty][i])
+
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = sequence
+                self._cache_bytes += sequence.nbytes
+                self._evict()
+
+        return sequence
+
+    @property
+    def cache_bytes(self) -> int:
+        """Number of bytes currently held by the cache."""
+        return self._cache_bytes
+
+    def clear_cache(self) -> None:
+        """Drop every cached light curve."""
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+    def _evict(self) -> None:
+        """Drop least recently used curves until the budget is met."""
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            _, sequence = self._cache.popitem(last=False)
+            self._cache_bytes -= sequence.nbytes
+
+    def __repr__(self):
+        sizes = ", ".join(
+            "{}: {}".format(ty, len(seq)) for ty, seq in self.items()
+        )
+        return "LazyCollection({{{}}})".format(sizes)
+
+
+class LazySequence(Sequence):
+    """Light curves of a single star type of a :class:`LazyCollection`.
+
+    Parameters
+    ----------
+    collection : LazyCollection
+        Collection the sequence belongs to.
+    ty : str
+        Star type.
+    """
+
+    def __init__(self, collection: LazyCollection, ty: str) -> None:
+        self.collection = collection
+        self.ty = ty
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("Light curve index out of range.")
+
+        return self.collection.load(self.ty, i)
+
+    def __len__(self) -> int:
+        return len(self.collection.sources[self.ty])
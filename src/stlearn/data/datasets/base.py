@@ -3,12 +3,76 @@ Base class for building datasets.
 """
 import numpy as np
 import pandas as pd
-from io import BytesIO
+from collections.abc import Mapping
 from pathlib import Path
-from zipfile import ZipFile
-from urllib.request import urlopen
+from zipfile import BadZipFile, ZipFile
 from typing import Dict, List, Union
 from tsfresh import extract_features
+from stlearn.conventions import LIGHTCURVE_COLUMNS
+from stlearn.data.ragged import RaggedArray
+from stlearn.io import download_file
+from stlearn.parallel import Executor, ExecutorDistributor, open_executor
+from stlearn.data.datasets._features import (
+    LABEL_COLUMNS,
+    FeatureCache,
+    FeatureMemo,
+    collection_fingerprint,
+    curve_keys,
+    extract_chunk,
+    fingerprint,
+    settings_hash,
+    value_columns,
+)
+
+
+def _frame_chunks(long_format, chunk_size):
+    """Slices of ``chunk_size`` whole curves of a long format frame."""
+    frame = long_format.sort_values(["id", "time"], kind="stable")
+    ids = frame["id"].to_numpy()
+    if len(ids) == 0:
+        return
+
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    bounds = np.append(starts[::chunk_size], len(ids))
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        yield frame.iloc[start:stop]
+
+
+def _drop_unused_ids(long_format):
+    """Frame without the categories of its 'id' column that are not used.
+
+    tsfresh groups by every category, observed or not, and fails on the
+    empty series of unused ones.
+    """
+    if not isinstance(long_format["id"].dtype, pd.CategoricalDtype):
+        return long_format
+
+    ids = long_format["id"].cat.remove_unused_categories()
+    return long_format.assign(id=ids)
+
+
+def _missing_tasks(chunks, columns, cache, fc_parameters, keys, hits):
+    """Extraction tasks of the curves of each chunk missing from ``cache``.
+
+    Appends the keys of every chunk to ``keys`` and the cached feature rows
+    of the chunk to ``hits``.
+    """
+    for chunk in chunks:
+        chunk_keys = curve_keys(chunk, columns)
+        keys.append(chunk_keys)
+
+        cached = pd.DataFrame()
+        if cache is not None:
+            cached = cache.load(chunk_keys)
+            hits.append(cached)
+
+        missing = chunk_keys.index[~chunk_keys.isin(cached.index)]
+        if len(missing) == 0:
+            continue
+        if len(missing) < len(chunk_keys):
+            chunk = chunk[chunk["id"].isin(missing)]
+        chunk = _drop_unused_ids(chunk)
+        yield chunk, chunk_keys, fc_parameters, "id", "time"
 
 
 class StellarDataset:
@@ -19,6 +83,9 @@ class StellarDataset:
 
     """
 
+    # star types of the dataset, in the order that defines their codes
+    TYPES = []
+
     def __init__(self):
         self._url = None
         self._name = None
@@ -26,15 +93,74 @@ class StellarDataset:
         self._data_collection = None
         self._id_dict = None
 
-        # Filled below
-        self.tsfresh_features = None
+        # results of as_tsfresh, keyed by input and settings
+        self.tsfresh_cache = FeatureMemo()
+
+    def download(
+        self,
+        chunk_size: int = 1 << 20,
+        progress=None,
+        resume: bool = True,
+        extract: bool = True,
+    ) -> Path:
+        """Download the dataset archive and optionally extract it.
+
+        The archive is streamed to disk, so a dropped connection can be
+        resumed by calling this method again. A downloaded file that is not a
+        valid zip archive is deleted before ``zipfile.BadZipFile`` is raised,
+        so the next call downloads it again.
 
-    def download(self) -> None:
+        The archive does not need to be extracted: ``from_folder`` and
+        ``lazy_from_folder`` read the light curves straight from it, which
+        avoids writing one small file per light curve::
+
+            dataset.download(extract=False)
+            collection = dataset.from_folder(dataset.archive_path)
+
+        Parameters
+        ----------
+        chunk_size : int, optional, default: 1 MiB
+            Number of bytes read from the connection at once.
+        progress : callable, optional, default: None
+            Function called as ``progress(downloaded, total)`` after each
+            chunk. ``total`` is None if the server does not report the size.
+        resume : bool, optional, default: True
+            Whether to resume an interrupted download.
+        extract : bool, optional, default: True
+            Whether to extract the archive into a folder next to it.
+
+        Returns
+        -------
+        pathlib.Path
+            Folder of the extracted dataset, or path of the archive if
+            ``extract`` is False. Either can be passed to ``from_folder``.
+        """
         self._temp.mkdir(exist_ok=True)
 
-        with urlopen(self._url) as zipresp:
-            with ZipFile(BytesIO(zipresp.read())) as zfile:
-                zfile.extractall(self._temp / self._name)
+        archive = download_file(
+            self._url,
+            self.archive_path,
+            chunk_size=chunk_size,
+            progress=progress,
+            resume=resume,
+        )
+        try:
+            with ZipFile(archive) as zfile:
+                if not extract:
+                    return Path(archive)
+                folder = self._temp / self._name
+                zfile.extractall(folder)
+        except BadZipFile:
+            # a corrupt archive would otherwise be reused by every call
+            Path(archive).unlink()
+            raise
+
+        return folder
+
+    @property
+    def archive_path(self) -> Path:
+        """Path where the downloaded archive of the dataset is stored."""
+        return self._temp / "{}.zip".format(self._name)
 
     def from_folder(
         self, folder: Union[Path, str], **kwargs
@@ -56,6 +182,18 @@ class StellarDataset:
         """
         raise NotImplementedError
 
+    def get_type_codes(self) -> Dict[str, int]:
+        """
+        Integer code of each star type, following the order of ``TYPES``.
+
+        Returns
+        -------
+        dict
+            Dictionary whose keys are the star type and whose values are the
+            codes.
+        """
+        return {ty: code for code, ty in enumerate(self.TYPES)}
+
     def get_data_collection(self) -> dict:
         """
         Getter method that returns the sequences as a dict where each key is
@@ -63,27 +201,249 @@ class StellarDataset:
         """
         return self._data_collection
 
-    def as_tsfresh(self, long_format: pd.DataFrame) -> pd.DataFrame:
+    def as_tsfresh(
+        self,
+        long_format: Union[pd.DataFrame, Dict[str, np.ndarray]],
+        backend: Union[str, Executor] = None,
+        n_jobs: int = None,
+        settings: dict = None,
+        chunk_size: int = None,
+        cache_dir: Union[Path, str] = None,
+        kind_settings: dict = None,
+    ) -> pd.DataFrame:
         """Transform the dataset into tsfresh features.
 
-        This method may take a while depending on the size of the data.
+        This method may take a while depending on the size of the data. When
+        ``chunk_size`` or ``cache_dir`` are given, the light curves are split
+        in chunks that are extracted independently (in parallel if a
+        ``backend`` is given), and with ``cache_dir`` the feature rows of each
+        chunk are stored on disk as soon as it is done. Curves whose features
+        are already cached for the same content and settings are not
+        recomputed, so re-runs and interrupted runs only compute what is
+        missing. The cache keeps the features of the latest content of each
+        curve id only, so a ``cache_dir`` is meant for a single dataset.
+
+        The 'type' and 'type_code' label columns of ``as_dataframe`` are not
+        used as signals.
+
+        ``long_format`` may also be the collection returned by
+        ``from_folder``. The long format frame of each chunk of curves is
+        then built on the fly and the full frame of ``as_dataframe`` is never
+        materialized, so memory is bounded by ``chunk_size``. The result is
+        the same as for the frame of ``as_dataframe``.
+
+        To compute only the features used by a fitted model, pass its
+        ``extraction_settings`` as ``kind_settings``.
+
+        Results are kept in ``tsfresh_cache``, keyed by a fingerprint of the
+        frame and the settings, so calling this method again on the same
+        frame returns the stored features while a different subset is
+        extracted. The cache holds several results within a memory budget,
+        see ``FeatureMemo``.
 
         Parameters
         ----------
-        long_format : pd.DataFrame
-            Long-format dataframe with all time series to extract.
+        long_format : pd.DataFrame or dict
+            Long-format dataframe with all time series to extract, or a
+            collection whose keys are the star type and whose values are a
+            list of numpy.array sequences.
+        backend : str or stlearn.parallel.Executor, optional, default: None
+            Execution backend used to compute the features. See
+            ``stlearn.parallel``. If None, tsfresh's own scheduler is used.
+        n_jobs : int, optional, default: None
+            Number of workers of a new backend. If None, the number of CPUs
+            available to the process is used.
+        settings : dict, optional, default: None
+            tsfresh ``default_fc_parameters``. If None, tsfresh's
+            comprehensive feature set is extracted.
+        chunk_size : int, optional, default: None
+            Number of light curves extracted at once. If None, all curves are
+            extracted in a single call, or in chunks of 100 curves when
+            ``cache_dir`` is given or ``long_format`` is a collection.
+        cache_dir : path-like, optional, default: None
+            Folder of the on-disk feature cache. If None, features are not
+            stored on disk.
+        kind_settings : dict, optional, default: None
+            tsfresh ``kind_to_fc_parameters`` with the features of each value
+            column, e.g. ``ModelBase.extraction_settings``. Only the columns
+            listed are extracted.
 
         Returns
         -------
         pandas.DataFrame
         """
-        if self.tsfresh_features is None:
-            extracted_features = extract_features(
-                long_format, column_id="id", column_sort="time"
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("'chunk_size' must be a positive integer.")
+
+        fc_parameters = {
+            "default_fc_parameters": settings,
+            "kind_to_fc_parameters": kind_settings,
+        }
+
+        if isinstance(long_format, Mapping):
+            return self._collection_tsfresh(
+                long_format,
+                backend,
+                n_jobs,
+                fc_parameters,
+                chunk_size or 100,
+                cache_dir,
             )
-            self.tsfresh_features = extracted_features
 
-        return self.tsfresh_features
+        unused = [col for col in LABEL_COLUMNS if col in long_format]
+        if kind_settings is not None:
+            unused += [
+                col
+                for col in value_columns(long_format)
+                if col not in kind_settings
+            ]
+        long_format = _drop_unused_ids(long_format.drop(columns=unused))
+
+        columns = value_columns(long_format)
+        key = (
+            fingerprint(long_format),
+            settings_hash(settings, columns, kind_settings),
+        )
+
+        extracted_features = self.tsfresh_cache.get(key)
+        if extracted_features is None:
+            if chunk_size is None and cache_dir is None:
+                extracted_features = self._extract_features(
+                    long_format, backend, n_jobs, fc_parameters
+                )
+            else:
+                extracted_features = self._extract_chunked(
+                    _frame_chunks(long_format, chunk_size or 100),
+                    columns,
+                    backend,
+                    n_jobs,
+                    fc_parameters,
+                    cache_dir,
+                )
+            self.tsfresh_cache.put(key, extracted_features)
+
+        return extracted_features
+
+    def _collection_tsfresh(
+        self, collection, backend, n_jobs, fc_parameters, chunk_size, cache_dir
+    ):
+        """``as_tsfresh`` of a collection, built chunk by chunk."""
+        if self._id_dict is None:
+            msg = "'get_ids' needs to be called first."
+            raise ValueError(msg)
+
+        kind_settings = fc_parameters["kind_to_fc_parameters"]
+        columns = [
+            col
+            for col in LIGHTCURVE_COLUMNS[1:]
+            if kind_settings is None or col in kind_settings
+        ]
+        key = (
+            collection_fingerprint(collection, self._id_dict),
+            settings_hash(
+                fc_parameters["default_fc_parameters"], columns, kind_settings
+            ),
+        )
+
+        extracted_features = self.tsfresh_cache.get(key)
+        if extracted_features is None:
+            extracted_features = self._extract_chunked(
+                self._collection_chunks(collection, chunk_size, columns),
+                columns,
+                backend,
+                n_jobs,
+                fc_parameters,
+                cache_dir,
+            )
+            # same row order as the frame of ``as_dataframe``
+            extracted_features = extracted_features.sort_index()
+            self.tsfresh_cache.put(key, extracted_features)
+
+        return extracted_features
+
+    def _collection_chunks(self, collection, chunk_size, columns):
+        """Long format frames of at most ``chunk_size`` curves of a class."""
+        for key in collection:
+            sequences = collection[key]
+            names = self._id_dict[key]
+
+            for start in range(0, len(sequences), chunk_size):
+                stop = min(start + chunk_size, len(sequences))
+                ragged = RaggedArray.from_sequences(
+                    sequences[start:stop], n_features=3
+                )
+                ids = np.array(
+                    [name.replace(".txt", "") for name in names[start:stop]],
+                    dtype=object,
+                )
+
+                frame = pd.DataFrame(ragged.data, columns=LIGHTCURVE_COLUMNS)
+                frame["id"] = np.repeat(ids, ragged.lengths)
+                frame = frame.sort_values(["id", "time"], kind="stable")
+                yield frame[["id", "time", *columns]]
+
+    @staticmethod
+    def _extract_features(long_format, backend, n_jobs, fc_parameters):
+        """Extract the features of a long format frame in a single call."""
+        if backend is None:
+            return extract_features(
+                long_format,
+                column_id="id",
+                column_sort="time",
+                **fc_parameters,
+            )
+
+        with open_executor(backend, n_workers=n_jobs) as executor:
+            return extract_features(
+                long_format,
+                column_id="id",
+                column_sort="time",
+                distributor=ExecutorDistributor(executor),
+                **fc_parameters,
+            )
+
+    @staticmethod
+    def _extract_chunked(
+        chunks, columns, backend, n_jobs, fc_parameters, cache_dir
+    ):
+        """Extract the features of chunks of whole curves.
+
+        ``chunks`` yields long format frames sorted by id and time. They are
+        read as workers become free, a few per worker at most, so only those
+        chunks and the feature rows are held in memory.
+        """
+        cache = None
+        if cache_dir is not None:
+            key = settings_hash(
+                fc_parameters["default_fc_parameters"],
+                columns,
+                fc_parameters["kind_to_fc_parameters"],
+            )
+            cache = FeatureCache(cache_dir, key)
+
+        keys = []
+        hits = []
+        computed = []
+        tasks = _missing_tasks(
+            chunks, columns, cache, fc_parameters, keys, hits
+        )
+        with open_executor(backend or "serial", n_workers=n_jobs) as executor:
+            for features in executor.imap_unordered(extract_chunk, tasks):
+                if cache is not None:
+                    cache.write(features)
+                computed.append(features)
+
+        if cache is not None and computed:
+            cache.compact()
+        if not keys:
+            return pd.DataFrame()
+
+        keys = pd.concat(keys)
+        features = pd.concat(hits + computed)
+        features = features[~features.index.duplicated(keep="last")]
+        features = features.reindex(keys.to_numpy())
+        features.index = keys.index.rename(None)
+        return features
 
     def pad_collection(
         collection: Dict[str, List[np.ndarray]]
@@ -113,27 +473,130 @@ class StellarDataset:
         """
         raise NotImplementedError
 
-    def as_dataframe(self, collection: Dict[str, np.ndarray]) -> pd.DataFrame:
+    def as_dataframe(
+        self,
+        collection: Dict[str, np.ndarray],
+        categorical: bool = False,
+        type_codes: bool = False,
+    ) -> pd.DataFrame:
         """
         Configure the dataset as a pandas.DataFrame in long format.
+
+        The frame is built in a single allocation from the concatenated
+        sequences of all classes, with the id and type of each row repeated
+        from per-sequence arrays.
+
+        Parameters
+        ----------
+        collection : dict
+            Dictionary whose keys are the star type and whose values are a
+            list of numpy.array sequences.
+        categorical : bool, optional, default: False
+            Whether to store the 'id' and 'type' columns as
+            pandas.Categorical, which stores one small integer per row instead
+            of a Python string.
+        type_codes : bool, optional, default: False
+            Whether to add a 'type_code' column with the integer code of the
+            star type (see ``get_type_codes``).
+
+        Returns
+        -------
+        pandas.DataFrame
         """
         if self._id_dict is None:
             msg = "'get_ids' needs to be called first."
             raise ValueError(msg)
 
-        df_dict = {}
-        for key in collection:
-            df_dict[key] = []
-            for i, seq in enumerate(collection[key]):
-                df = pd.DataFrame(
-                    seq, columns=["time", "flux", "flux_error"]
-                )  # TODO: get from conventions
-                df["id"] = self._id_dict[key][i].replace(".txt", "")
-                df["type"] = key
+        raggeds = {
+            key: RaggedArray.from_sequences(collection[key], n_features=3)
+            for key in collection
+        }
+        n_rows = sum(len(ragged.data) for ragged in raggeds.values())
+
+        values = np.empty((n_rows, 3), dtype=np.float64)
+        names = []
+        lengths = []
+        start = 0
+        for key, ragged in raggeds.items():
+            end = start + len(ragged.data)
+            values[start:end] = ragged.data
+            start = end
 
-                df_dict[key].append(df)
+            names.extend(self._id_dict[key][: len(ragged)])
+            lengths.append(ragged.lengths)
 
-            df_dict[key] = pd.concat(df_dict[key])
+        lengths = np.concatenate(lengths) if lengths else np.empty(0, int)
+        ids = np.array(
+            [name.replace(".txt", "") for name in names], dtype=object
+        )
+        types = np.array(list(raggeds), dtype=object)
+        class_rows = [len(ragged.data) for ragged in raggeds.values()]
+
+        df_long = pd.DataFrame(values, columns=LIGHTCURVE_COLUMNS, copy=False)
+
+        if categorical:
+            id_codes, id_categories = pd.factorize(ids)
+            df_long["id"] = pd.Categorical.from_codes(
+                np.repeat(id_codes, lengths), categories=id_categories
+            )
+            df_long["type"] = pd.Categorical.from_codes(
+                np.repeat(np.arange(len(types)), class_rows), categories=types
+            )
+        else:
+            df_long["id"] = np.repeat(ids, lengths)
+            df_long["type"] = np.repeat(types, class_rows)
+
+        if type_codes:
+            codes = self.get_type_codes()
+            missing = [key for key in raggeds if key not in codes]
+            if missing:
+                msg = "Unknown star types: {}.".format(", ".join(missing))
+                raise ValueError(msg)
+
+            dtype = np.min_scalar_type(max(len(codes) - 1, 0))
+            df_long["type_code"] = np.repeat(
+                np.array([codes[key] for key in raggeds], dtype=dtype),
+                class_rows,
+            )
 
-        df_long = pd.concat(df_dict.values())
         return df_long
+
+    def as_features(self, collection: Dict[str, np.ndarray], **kwargs):
+        """
+        Compute the stellar variability features of every light curve.
+
+        Native alternative to ``as_tsfresh`` that computes a curated feature
+        set with batch kernels over each class, see
+        ``stlearn.features.extract_stellar_features``.
+
+        Parameters
+        ----------
+        collection : dict
+            Dictionary whose keys are the star type and whose values are a
+            list of numpy.array sequences.
+        **kwargs
+            Arguments passed to ``extract_stellar_features``.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per light curve, indexed by the ids of ``as_dataframe``.
+        """
+        # stlearn.features depends on stlearn.utils, which imports this
+        # package through stlearn.data
+        from stlearn.features import extract_stellar_features
+
+        if self._id_dict is None:
+            msg = "'get_ids' needs to be called first."
+            raise ValueError(msg)
+
+        frames = extract_stellar_features(collection, **kwargs)
+        ids = [
+            name.replace(".txt", "")
+            for key in collection
+            for name in self._id_dict[key][: len(collection[key])]
+        ]
+
+        features = pd.concat(list(frames.values()), ignore_index=True)
+        features.index = pd.Index(ids, dtype=object)
+        return features
@@ -2,32 +2,270 @@
 """
 import numpy as np
 from typing import List
+from stlearn.data.ragged import RaggedArray, segment_mean, segment_median
 
 
-def pad_sequences(sequences: List[np.ndarray], max_length: int = None):
-    """Pad each individual sequence of the given list of sequences with zeros.
+def pad_sequences(
+    sequences: List[np.ndarray],
+    max_length: int = None,
+    value: float = 0.0,
+    return_mask: bool = False,
+):
+    """Pad each individual sequence of the given list of sequences.
+
+    The output is allocated once and each sequence is copied into it a
+    single time. Sequences longer than ``max_length`` are truncated.
 
     Parameters
     ----------
-    squences : list or numpy.ndarray
+    squences : list, RaggedArray or numpy.ndarray
         List of numpy arrays of shape (n_timestamps, n_features).
     max_length : int, optional, default: None
-         Desired length of each sequence.
+         Desired length of each sequence. If None, the length of the longest
+         sequence is used.
+    value : float, optional, default: 0.0
+        Value used to pad, e.g. numpy.nan to tell padding apart from real
+        measurements.
+    return_mask : bool, optional, default: False
+        Whether to also return the validity mask.
 
     Returns
     -------
     numpy.ndarray
-        Padded sequences as array.
+        Padded sequences as array of shape (n_sequences, max_length,
+        n_features).
+    numpy.ndarray
+        Only if ``return_mask`` is True. Boolean array of shape
+        (n_sequences, max_length) that is True where the padded array holds a
+        value of the sequence and False where it holds padding.
     """
+    if isinstance(sequences, RaggedArray):
+        # per-sequence views, no copy
+        lengths = sequences.lengths
+        n_features = sequences.n_features
+    else:
+        sequences = [np.asarray(sq) for sq in sequences]
+        lengths = np.array([len(sq) for sq in sequences], dtype=np.int64)
+        n_features = sequences[0].shape[1] if len(sequences) > 0 else 0
+
     if max_length is None:
-        max_length = max([len(sq) for sq in sequences])
+        max_length = int(lengths.max()) if len(lengths) > 0 else 0
+
+    lengths = np.minimum(lengths, max_length)
+    mask = np.arange(max_length) < lengths[:, np.newaxis]
+
+    padded = np.full(
+        (len(lengths), max_length, n_features), value, dtype=np.float64
+    )
+    for i, (sq, length) in enumerate(zip(sequences, lengths)):
+        padded[i, :length] = sq[:length]
+
+    if return_mask:
+        return padded, mask
+
+    return padded
+
+
+def bucket_boundaries(lengths, n_buckets: int) -> np.ndarray:
+    """Compute bucket boundaries from the quantiles of the lengths.
+
+    Parameters
+    ----------
+    lengths : array-like
+        Length of each sequence.
+    n_buckets : int
+        Desired number of buckets. Fewer are returned if quantiles coincide.
+
+    Returns
+    -------
+    numpy.ndarray
+        Sorted upper bound (inclusive) of the length of each bucket.
+    """
+    if n_buckets < 1:
+        raise ValueError("'n_buckets' must be a positive integer.")
+
+    lengths = np.asarray(lengths)
+    if len(lengths) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    quantiles = np.linspace(0, 1, n_buckets + 1)[1:]
+    boundaries = np.ceil(np.quantile(lengths, quantiles)).astype(np.int64)
+    return np.unique(boundaries)
+
+
+def _assign_buckets(lengths, boundaries) -> np.ndarray:
+    """Bucket of each sequence, with an extra one above the last boundary."""
+    boundaries = np.sort(np.asarray(boundaries))
+    return np.searchsorted(boundaries, lengths, side="left")
+
+
+def bucket_sequences(
+    sequences: List[np.ndarray],
+    boundaries=None,
+    n_buckets: int = 4,
+    value: float = 0.0,
+    return_mask: bool = False,
+):
+    """Group sequences of similar length and pad each group separately.
+
+    Sequence ``i`` goes to the first bucket whose boundary is greater or
+    equal than its length, and each bucket is padded to the length of its
+    longest sequence, which wastes far less memory than padding everything
+    to the longest sequence of the collection.
+
+    Parameters
+    ----------
+    sequences : list or RaggedArray
+        List of numpy arrays of shape (n_timestamps, n_features).
+    boundaries : array-like, optional, default: None
+        Upper bound (inclusive) of the length of each bucket. Sequences longer
+        than the last boundary go to an extra bucket. If None, boundaries are
+        computed from the quantiles of the lengths.
+    n_buckets : int, optional, default: 4
+        Number of quantile buckets when ``boundaries`` is None.
+    value : float, optional, default: 0.0
+        Value used to pad.
+    return_mask : bool, optional, default: False
+        Whether to also yield the validity mask of each bucket.
+
+    Yields
+    ------
+    indices : numpy.ndarray
+        Position in ``sequences`` of the sequences of the bucket.
+    padded : numpy.ndarray
+        Padded sequences of the bucket, see ``pad_sequences``.
+    mask : numpy.ndarray
+        Only if ``return_mask`` is True. Validity mask of the bucket.
+    """
+    lengths = np.array([len(sq) for sq in sequences], dtype=np.int64)
+    if boundaries is None:
+        boundaries = bucket_boundaries(lengths, n_buckets)
+
+    buckets = _assign_buckets(lengths, boundaries)
+    for bucket in np.unique(buckets):
+        indices = np.flatnonzero(buckets == bucket)
+        result = pad_sequences(
+            [sequences[i] for i in indices],
+            value=value,
+            return_mask=return_mask,
+        )
+        if return_mask:
+            yield (indices,) + result
+        else:
+            yield indices, result
+
+
+def padding_overhead(lengths, boundaries=None) -> float:
+    """Fraction of a padded tensor taken by padding.
+
+    Parameters
+    ----------
+    lengths : array-like
+        Length of each sequence.
+    boundaries : array-like, optional, default: None
+        Bucket boundaries, see ``bucket_sequences``. If None, all sequences
+        are padded to the longest one.
+
+    Returns
+    -------
+    float
+        Number of padding timestamps divided by the total number of padded
+        timestamps.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if len(lengths) == 0:
+        return 0.0
+
+    if boundaries is None:
+        buckets = np.zeros(len(lengths), dtype=np.int64)
+    else:
+        buckets = _assign_buckets(lengths, boundaries)
+
+    padded = 0
+    for bucket in np.unique(buckets):
+        in_bucket = lengths[buckets == bucket]
+        padded += len(in_bucket) * in_bucket.max()
+
+    if padded == 0:
+        return 0.0
+
+    return 1 - lengths.sum() / padded
+
+
+def resample_sequences(
+    sequences: List[np.ndarray],
+    cadence: float,
+    n_bins: int = None,
+    start=None,
+    statistic: str = "mean",
+) -> np.ndarray:
+    """Rebin every sequence onto a uniform time grid.
+
+    The first feature of each sequence is the time. The remaining features
+    of all the timestamps that fall in the same bin are aggregated with the
+    given statistic, for all sequences at once over a single concatenated
+    buffer. Bins without finite values are NaN.
+
+    Parameters
+    ----------
+    sequences : list or RaggedArray
+        List of numpy arrays of shape (n_timestamps, n_features).
+    cadence : float
+        Width of each bin, in the units of the time feature.
+    n_bins : int, optional, default: None
+        Number of bins of the grid. Timestamps beyond the last bin are
+        dropped. If None, enough bins to hold the longest sequence are used.
+    start : float or array-like, optional, default: None
+        Start of the grid, either shared by all sequences or one per
+        sequence. If None, each grid starts at the first finite timestamp of
+        its sequence.
+    statistic : str, optional, default: "mean"
+        Aggregation of each bin, either "mean" or "median".
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n_sequences, n_bins, n_features) whose first feature
+        is the center of each bin.
+    """
+    if statistic not in ("mean", "median"):
+        msg = "'statistic' must be 'mean' or 'median'."
+        raise ValueError(msg)
+    if cadence <= 0:
+        raise ValueError("'cadence' must be positive.")
+
+    ragged = RaggedArray.from_sequences(sequences)
+    n_sequences = len(ragged)
+    segments = ragged.segment_ids
+    time = ragged.time
+
+    if start is None:
+        start = np.full(n_sequences, np.nan)
+        finite = np.isfinite(time)
+        np.fmin.at(start, segments[finite], time[finite])
+    start = np.broadcast_to(np.asarray(start, dtype=np.float64), n_sequences)
+
+    with np.errstate(invalid="ignore"):
+        bins = np.floor((time - start[segments]) / cadence)
+
+    if n_bins is None:
+        n_bins = int(np.nanmax(bins)) + 1 if np.isfinite(bins).any() else 0
+
+    in_grid = np.isfinite(bins) & (bins >= 0) & (bins < n_bins)
 
-    for i, fsq in enumerate(sequences):
-        if len(fsq) != max_length:
-            dim = (max_length - len(fsq), fsq.shape[1])
-            padding = np.zeros(dim)
-            padded = np.vstack((fsq, padding))
+    resampled = np.full(
+        (n_sequences, n_bins, ragged.n_features), np.nan, dtype=np.float64
+    )
+    resampled[..., 0] = start[:, np.newaxis] + cadence * (
+        np.arange(n_bins) + 0.5
+    )
 
-            sequences[i] = padded
+    for feature in range(1, ragged.n_features):
+        values = ragged.data[:, feature]
+        valid = in_grid & np.isfinite(values)
+        flat = segments[valid] * n_bins + bins[valid].astype(np.int64)
+        reduce = segment_mean if statistic == "mean" else segment_median
+        result = reduce(values[valid], flat, n_sequences * n_bins)
+        resampled[..., feature] = result.reshape(n_sequences, n_bins)
 
-    return np.stack(sequences)
+    return resampled
@@ -0,0 +1,236 @@
+"""
+Ragged arrays: collections of sequences of different lengths stored in a
+single contiguous buffer.
+"""
+import numpy as np
+
+from collections.abc import Sequence
+from typing import List
+
+
+class RaggedArray(Sequence):
+    """Sequences of different lengths stored in one contiguous buffer.
+
+    All sequences are stacked row-wise in ``values`` and sequence ``i`` is
+    ``values[offsets[i]:offsets[i + 1]]``. Indexing returns views of the
+    buffer, so no data is copied, and operations over the whole collection
+    can be vectorized over ``values`` using ``offsets`` or ``segment_ids``.
+
+    It behaves like a list of numpy arrays of shape (n_timestamps,
+    n_features), so it can be used wherever such a list is expected.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Array of shape (n_timestamps_total, n_features) with all sequences.
+    offsets : numpy.ndarray
+        Array of shape (n_sequences + 1,) with the start of each sequence and
+        the end of the last one.
+    """
+
+    def __init__(self, values: np.ndarray, offsets: np.ndarray) -> None:
+        offsets = np.asarray(offsets, dtype=np.int64)
+
+        if values.ndim != 2:
+            raise ValueError("'values' must be a 2-dimensional array.")
+        if offsets.ndim != 1 or len(offsets) == 0:
+            raise ValueError("'offsets' must be a non-empty 1-d array.")
+        if offsets[-1] > len(values) or np.any(np.diff(offsets) < 0):
+            raise ValueError("'offsets' must be non-decreasing and in range.")
+
+        self.values = values
+        self.offsets = offsets
+
+    @classmethod
+    def from_sequences(
+        cls, sequences: List[np.ndarray], n_features: int = None
+    ) -> "RaggedArray":
+        """Build a ragged array by copying a list of sequences.
+
+        Parameters
+        ----------
+        sequences : list
+            List of numpy arrays of shape (n_timestamps, n_features).
+        n_features : int, optional, default: None
+            Number of features, only needed when ``sequences`` is empty.
+
+        Returns
+        -------
+        RaggedArray
+        """
+        if isinstance(sequences, RaggedArray):
+            return sequences
+
+        lengths = np.array([len(sq) for sq in sequences], dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        if len(sequences) > 0:
+            values = np.concatenate(
+                [np.asarray(sq, dtype=np.float64) for sq in sequences]
+            )
+        else:
+            values = np.empty((0, n_features or 0), dtype=np.float64)
+
+        return cls(values, offsets)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Length of each sequence."""
+        return np.diff(self.offsets)
+
+    @property
+    def segment_ids(self) -> np.ndarray:
+        """Index of the sequence each row of ``values`` belongs to."""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    @property
+    def data(self) -> np.ndarray:
+        """Rows of ``values`` that belong to a sequence."""
+        return self.values[self.offsets[0]:self.offsets[-1]]
+
+    @property
+    def n_features(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def time(self) -> np.ndarray:
+        """First feature (time) of every row of the collection."""
+        return self.data[:, 0]
+
+    @property
+    def flux(self) -> np.ndarray:
+        """Second feature (flux) of every row of the collection."""
+        return self.data[:, 1]
+
+    @property
+    def flux_err(self) -> np.ndarray:
+        """Third feature (flux error) of every row of the collection."""
+        return self.data[:, 2]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.offsets.nbytes
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return RaggedArray.from_sequences(
+                    [self[j] for j in range(start, stop, step)],
+                    n_features=self.n_features,
+                )
+
+            stop = max(start, stop)
+            return RaggedArray(self.values, self.offsets[start:stop + 1])
+
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("Sequence index out of range.")
+
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __repr__(self):
+        return "RaggedArray(n_sequences={}, n_timestamps={})".format(
+            len(self), self.offsets[-1] - self.offsets[0]
+        )
+
+
+def segment_mean(values, segments, n_segments) -> np.ndarray:
+    """
+    Mean of the values of each segment.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Finite values.
+    segments : numpy.ndarray
+        Segment index of each value.
+    n_segments : int
+        Number of segments.
+
+    Returns
+    -------
+    numpy.ndarray
+        Mean of each segment, NaN for empty segments.
+    """
+    counts = np.bincount(segments, minlength=n_segments)
+    sums = np.bincount(segments, weights=values, minlength=n_segments)
+
+    means = np.full(n_segments, np.nan)
+    filled = counts > 0
+    means[filled] = sums[filled] / counts[filled]
+    return means
+
+
+def segment_median(values, segments, n_segments) -> np.ndarray:
+    """
+    Median of the values of each segment.
+
+    Values are sorted once by segment and value, so the median of every
+    segment is read from the middle of its sorted run. When the segments are
+    already contiguous and long, each run is sorted in place, which is much
+    faster than sorting the whole buffer by two keys.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Finite values.
+    segments : numpy.ndarray
+        Segment index of each value.
+    n_segments : int
+        Number of segments.
+
+    Returns
+    -------
+    numpy.ndarray
+        Median of each segment, NaN for empty segments.
+    """
+    counts = np.bincount(segments, minlength=n_segments)
+    starts = np.cumsum(counts) - counts
+
+    contiguous = len(values) == 0 or np.all(segments[1:] >= segments[:-1])
+    if contiguous and len(values) >= 64 * np.count_nonzero(counts):
+        values = values.copy()
+        bounds = np.append(starts, len(values)).tolist()
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            values[start:stop].sort()
+    else:
+        values = values[np.lexsort((values, segments))]
+
+    medians = np.full(n_segments, np.nan)
+    filled = counts > 0
+    starts = starts[filled]
+    n = counts[filled]
+    medians[filled] = (
+        values[starts + (n - 1) // 2] + values[starts + n // 2]
+    ) / 2
+    return medians
+
+
+def segment_mad(values, segments, n_segments) -> np.ndarray:
+    """
+    Median absolute deviation of the values of each segment.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Finite values.
+    segments : numpy.ndarray
+        Segment index of each value.
+    n_segments : int
+        Number of segments.
+
+    Returns
+    -------
+    numpy.ndarray
+        MAD of each segment, NaN for empty segments.
+    """
+    medians = segment_median(values, segments, n_segments)
+    deviations = np.abs(values - medians[segments])
+    return segment_median(deviations, segments, n_segments)
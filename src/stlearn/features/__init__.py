@@ -0,0 +1,10 @@
+"""
+Feature extraction from light curves.
+"""
+
+from ._periodogram import (
+    batch_extract_frequencies,
+    extract_frequencies,
+    frequency_grid,
+)
+from ._native import extract_stellar_features
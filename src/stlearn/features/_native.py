@@ -0,0 +1,276 @@
+"""
+Stellar variability features computed with batch kernels over a whole
+collection of light curves.
+"""
+import numpy as np
+import pandas as pd
+
+from collections.abc import Mapping
+from scipy.fft import next_fast_len
+from stlearn.data.preprocessing import resample_sequences
+from stlearn.data.ragged import RaggedArray, segment_mean
+from stlearn.utils import batch_ptp
+from stlearn.utils._batch import _rms_timescales, _time_range
+
+
+DEFAULT_TIMESCALES = (1 / 24, 6 / 24, 1.0)
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_LAGS = (1, 2, 5, 10, 50)
+
+
+def _segment_sort(values, bounds) -> np.ndarray:
+    """Copy of ``values`` with each segment sorted, NaNs last."""
+    values = values.copy()
+    bounds = np.asarray(bounds).tolist()
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        values[start:stop].sort()
+    return values
+
+
+def _segment_quantiles(sorted_values, starts, counts, quantiles):
+    """Linearly interpolated quantiles of each segment of a sorted buffer."""
+    result = np.full((len(counts), len(quantiles)), np.nan)
+    filled = counts > 0
+    starts, counts = starts[filled], counts[filled]
+
+    for k, quantile in enumerate(quantiles):
+        position = (counts - 1) * quantile
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, counts - 1)
+        weight = position - low
+        result[filled, k] = (1 - weight) * sorted_values[
+            starts + low
+        ] + weight * sorted_values[starts + high]
+
+    return result
+
+
+def _moments(flux, segments, n):
+    """Standard deviation, skewness and excess kurtosis of each segment."""
+    finite = np.isfinite(flux)
+    counts = np.bincount(segments[finite], minlength=n)
+    means = segment_mean(flux[finite], segments[finite], n)
+
+    centered = np.where(finite, flux - means[segments], 0.0)
+    squared = centered * centered
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m2, m3, m4 = (
+            np.bincount(segments, weights=power, minlength=n) / counts
+            for power in (squared, squared * centered, squared * squared)
+        )
+        std = np.sqrt(m2)
+        skew = np.where(m2 > 0, m3 / m2 ** 1.5, np.nan)
+        kurtosis = np.where(m2 > 0, m4 / m2 ** 2 - 3, np.nan)
+
+    return centered, counts, std, skew, kurtosis
+
+
+def _autocorrelation(centered, segments, n, lags):
+    """Autocorrelation of each segment at lags given in samples."""
+    denominator = np.bincount(
+        segments, weights=centered * centered, minlength=n
+    )
+    acf = np.full((n, len(lags)), np.nan)
+
+    for k, lag in enumerate(lags):
+        if lag >= len(centered):
+            continue
+
+        # pairs of points ``lag`` samples apart within the same curve
+        same = segments[lag:] == segments[:-lag]
+        products = (centered[lag:] * centered[:-lag])[same]
+        numerator = np.bincount(
+            segments[lag:][same], weights=products, minlength=n
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            acf[:, k] = np.where(
+                denominator > 0, numerator / denominator, np.nan
+            )
+
+    return acf
+
+
+def _dominant_periods(ragged, n_periods, oversampling, max_block=1 << 22):
+    """Periods (days) and amplitudes of the highest peaks of the spectrum.
+
+    Curves are rebinned onto a grid with the median cadence of the
+    collection, and the amplitude spectra of blocks of curves are computed
+    with a single zero-padded FFT, ``oversampling`` times finer than the
+    longest baseline.
+    """
+    n = len(ragged)
+    periods = np.full((n, n_periods), np.nan)
+    amplitudes = np.full((n, n_periods), np.nan)
+
+    segments = ragged.segment_ids
+    steps = np.diff(ragged.time)
+    steps = steps[(segments[1:] == segments[:-1]) & (steps > 0)]
+    if len(steps) == 0:
+        return periods, amplitudes
+
+    cadence = np.median(steps)
+    time_min, time_max = _time_range(ragged)
+    spans = (time_max - time_min)[np.isfinite(time_min)]
+    n_bins = int(np.floor(spans.max() / cadence)) + 1
+    n_fft = next_fast_len(oversampling * n_bins)
+    block = max(1, max_block // n_fft)
+
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        flux = resample_sequences(ragged[start:stop], cadence, n_bins=n_bins)
+        flux = flux[..., 1]
+
+        valid = np.isfinite(flux)
+        counts = valid.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(valid, flux, 0).sum(axis=1) / counts
+            centered = np.where(valid, flux - means[:, np.newaxis], 0)
+            spectrum = (
+                2 * np.abs(np.fft.rfft(centered, n=n_fft, axis=1))
+                / counts[:, np.newaxis]
+            )
+
+        # local maxima of each spectrum, the zero frequency excluded
+        peaks = np.full(spectrum.shape, -np.inf)
+        inner = (spectrum[:, 1:-1] > spectrum[:, :-2]) & (
+            spectrum[:, 1:-1] >= spectrum[:, 2:]
+        )
+        inner[:, 0] = False
+        peaks[:, 1:-1] = np.where(inner, spectrum[:, 1:-1], -np.inf)
+
+        top = np.argsort(-peaks, axis=1)[:, :n_periods]
+        top_amplitudes = np.take_along_axis(peaks, top, axis=1)
+        found = np.isfinite(top_amplitudes)
+
+        periods[start:stop][found] = n_fft * cadence / top[found]
+        amplitudes[start:stop] = np.where(found, top_amplitudes, np.nan)
+
+    return periods, amplitudes
+
+
+def extract_stellar_features(
+    sequences,
+    timescales=DEFAULT_TIMESCALES,
+    percentiles=DEFAULT_PERCENTILES,
+    lags=DEFAULT_LAGS,
+    n_periods: int = 2,
+    oversampling: int = 5,
+):
+    """
+    Compute a stellar variability feature set for many light curves at once.
+
+    Features are computed with batch kernels over the concatenated buffer of
+    the collection, with no Python call per feature and per curve:
+
+    * ``rms_<h>h``: robust RMS on each timescale, see
+      ``stlearn.utils.batch_rms_timescales``. NaN for curves with a single
+      timestamp.
+    * ``ptp``: robust point-to-point scatter, see ``stlearn.utils.batch_ptp``.
+    * ``std``, ``skew``, ``kurtosis``: moments of the flux (excess kurtosis).
+    * ``p<q>``: percentiles of the flux.
+    * ``amplitude_ratio``: 5-95 over 25-75 percentile range, ``ptp_ratio``:
+      ``ptp / std`` and ``rms_ratio``: RMS on the longest over the shortest
+      timescale.
+    * ``acf_<lag>``: autocorrelation of the flux at lags in samples.
+    * ``period_<k>``, ``period_amplitude_<k>``: period (days) and amplitude
+      of the highest peaks of the amplitude spectrum. Curves are rebinned to
+      the median cadence of the collection and their spectra computed with
+      one FFT per block of curves, which suits regularly sampled surveys.
+      The frequency grid depends on the cadence and longest baseline of the
+      collection.
+
+    Parameters
+    ----------
+    sequences : list, RaggedArray or dict
+        Light curves as arrays of shape (n_timestamps, n_features) whose
+        first two features are the time (days) and the flux, sorted by time,
+        or a dictionary of them such as the one returned by ``from_folder``.
+    timescales : array-like, optional
+        Timescales of the robust RMS, in days. Default=1, 6 and 24 hours.
+    percentiles : array-like, optional
+        Percentiles of the flux, between 0 and 100.
+    lags : array-like, optional
+        Lags of the autocorrelation, in samples.
+    n_periods : int, optional, default: 2
+        Number of dominant periods. 0 skips the spectra.
+    oversampling : int, optional, default: 5
+        Number of frequencies per resolution element of the longest curve.
+
+    Returns
+    -------
+    pandas.DataFrame or dict
+        One row of features per light curve, in the order of the sequences.
+        A dictionary with the same keys for dictionary inputs.
+    """
+    kwargs = dict(
+        timescales=timescales,
+        percentiles=percentiles,
+        lags=lags,
+        n_periods=n_periods,
+        oversampling=oversampling,
+    )
+    if isinstance(sequences, Mapping):
+        # one collection, so every class shares the grid of the spectra
+        keys = list(sequences)
+        features = extract_stellar_features(
+            [seq for key in keys for seq in sequences[key]], **kwargs
+        )
+        bounds = np.cumsum([0] + [len(sequences[key]) for key in keys])
+        return {
+            key: features.iloc[start:stop].reset_index(drop=True)
+            for key, start, stop in zip(keys, bounds[:-1], bounds[1:])
+        }
+
+    ragged = RaggedArray.from_sequences(sequences, n_features=2)
+    timescales = np.atleast_1d(np.asarray(timescales, dtype=np.float64))
+    percentiles = np.atleast_1d(np.asarray(percentiles, dtype=np.float64))
+    lags = [int(lag) for lag in lags]
+    n = len(ragged)
+
+    segments = ragged.segment_ids
+    flux = np.ascontiguousarray(ragged.flux)
+    bounds = ragged.offsets - ragged.offsets[0]
+    features = {}
+
+    # a curve without time span gets NaN instead of failing the collection
+    rms = _rms_timescales(ragged, timescales, strict=False)
+    for k, timescale in enumerate(timescales):
+        features["rms_{:g}h".format(timescale * 24)] = rms[:, k]
+
+    ptp = batch_ptp(ragged)
+    features["ptp"] = ptp
+
+    centered, counts, std, skew, kurtosis = _moments(flux, segments, n)
+    features["std"] = std
+    features["skew"] = skew
+    features["kurtosis"] = kurtosis
+
+    quantiles = np.concatenate((percentiles, [5, 25, 75, 95])) / 100
+    values = _segment_quantiles(
+        _segment_sort(flux, bounds), bounds[:-1], counts, quantiles
+    )
+    for k, percentile in enumerate(percentiles):
+        features["p{:g}".format(percentile)] = values[:, k]
+
+    p5, p25, p75, p95 = values[:, -4:].T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features["amplitude_ratio"] = (p95 - p5) / (p75 - p25)
+        features["ptp_ratio"] = ptp / std
+        features["rms_ratio"] = rms[:, np.argmax(timescales)] / rms[
+            :, np.argmin(timescales)
+        ]
+
+    acf = _autocorrelation(centered, segments, n, lags)
+    for k, lag in enumerate(lags):
+        features["acf_{}".format(lag)] = acf[:, k]
+
+    if n_periods > 0:
+        periods, amplitudes = _dominant_periods(
+            ragged, n_periods, oversampling
+        )
+        for k in range(n_periods):
+            features["period_{}".format(k + 1)] = periods[:, k]
+        for k in range(n_periods):
+            features["period_amplitude_{}".format(k + 1)] = amplitudes[:, k]
+
+    return pd.DataFrame(features)
@@ -0,0 +1,317 @@
+"""
+Frequency extraction with Lomb-Scargle periodograms and iterative
+prewhitening.
+"""
+import numpy as np
+import astropy.units as a_units
+
+from functools import lru_cache
+from astropy.table import Table
+from astropy.timeseries import LombScargle
+from scipy.optimize import minimize_scalar
+from stlearn.utils import get_time_flux
+from stlearn.parallel import open_executor
+
+
+# seconds in a day, times are given in days and frequencies in uHz
+_DAY = 86400.0
+
+
+@lru_cache(maxsize=64)
+def _cached_grid(cadence: float, baseline: float, oversampling: int):
+    df = 1 / (baseline * oversampling)
+    nyquist = 1 / (2 * cadence)
+    grid = np.arange(df, nyquist, df)
+    grid.setflags(write=False)
+    return grid
+
+
+def frequency_grid(cadence: float, baseline: float, oversampling: int = 5):
+    """
+    Regular frequency grid of a light curve, in Hz.
+
+    The grid goes from the frequency resolution up to the Nyquist frequency.
+    Grids are cached per cadence and baseline (rounded to a second and a
+    hundredth of a day), so light curves of the same survey share them.
+
+    Parameters
+    ----------
+    cadence : float
+        Time between consecutive timestamps, in days.
+    baseline : float
+        Time between the first and the last timestamps, in days.
+    oversampling : int, optional, default: 5
+        Number of grid points per resolution element ``1 / baseline``.
+
+    Returns
+    -------
+    numpy.ndarray
+        Read-only frequency grid, in Hz.
+    """
+    if cadence <= 0 or baseline <= 0:
+        raise ValueError("'cadence' and 'baseline' must be positive.")
+
+    cadence = max(round(cadence * _DAY), 1.0)
+    baseline = max(round(baseline, 2), 0.01) * _DAY
+    return _cached_grid(cadence, baseline, int(oversampling))
+
+
+def _fit_sinusoid(time, flux, weights, frequency):
+    """Weighted least squares sinusoid fit, returns (amp, phase, model)."""
+    arg = 2 * np.pi * frequency * time
+    design = np.column_stack((np.sin(arg), np.cos(arg), np.ones_like(time)))
+    coef, _, _, _ = np.linalg.lstsq(
+        design * weights[:, np.newaxis], flux * weights, rcond=None
+    )
+    amplitude = np.hypot(coef[0], coef[1])
+    phase = np.arctan2(coef[1], coef[0])
+    return amplitude, phase, design[:, :2] @ coef[:2]
+
+
+def _refine_frequency(time, flux, weights, frequency, step):
+    """Non-linear least squares frequency of a sinusoid near ``frequency``.
+
+    The amplitude, phase and offset are fitted linearly at each trial
+    frequency, and the weighted sum of squared residuals is minimized within
+    a grid ``step`` of the peak.
+    """
+    weighted = flux * weights
+
+    def cost(trial):
+        arg = 2 * np.pi * trial * time
+        design = np.column_stack(
+            (np.sin(arg), np.cos(arg), np.ones_like(time))
+        ) * weights[:, np.newaxis]
+        coef, _, _, _ = np.linalg.lstsq(design, weighted, rcond=None)
+        return np.sum((weighted - design @ coef) ** 2)
+
+    low = max(frequency - step, step / 2)
+    result = minimize_scalar(
+        cost,
+        bounds=(low, frequency + step),
+        method="bounded",
+        options={"xatol": 1e-4 * step},
+    )
+    return result.x if result.fun <= cost(frequency) else frequency
+
+
+def _amplitude_spectrum(time, flux, grid):
+    power = LombScargle(
+        time, flux, fit_mean=False, center_data=True, normalization="psd"
+    ).power(grid, method="fast", assume_regular_frequency=True)
+    return np.sqrt(4 * np.clip(power, 0, None) / len(time))
+
+
+def extract_frequencies(
+    lc,
+    n_peaks: int = 6,
+    n_harmonics: int = 10,
+    snr_threshold: float = 4.0,
+    oversampling: int = 5,
+) -> dict:
+    """
+    Extract the dominant frequencies of a light curve by prewhitening.
+
+    At each step the highest peak of the Lomb-Scargle amplitude spectrum of
+    the residuals is refined by non-linear least squares, fitted and
+    subtracted, together with its harmonics. Peaks closer than the frequency
+    resolution ``1 / baseline`` to an already extracted frequency are
+    leakage of it, and are subtracted but not kept. Peaks at an integer
+    multiple of an already extracted frequency are tagged as harmonics of
+    it. Extraction stops when the signal-to-noise
+    ratio of the highest peak, against the median of the amplitude
+    spectrum, falls below ``snr_threshold``.
+
+    Parameters
+    ----------
+    lc : lightkurve.TessLightCurve, numpy.ndarray or tuple
+        Light curve, in any format accepted by
+        ``stlearn.utils.get_time_flux``. Time must be in days.
+    n_peaks : int, optional, default: 6
+        Maximum number of independent frequencies to extract.
+    n_harmonics : int, optional, default: 10
+        Maximum number of harmonics searched for each frequency.
+    snr_threshold : float, optional, default: 4.0
+        Minimum signal-to-noise ratio of an extracted peak.
+    oversampling : int, optional, default: 5
+        Oversampling of the frequency grid, see ``frequency_grid``.
+
+    Returns
+    -------
+    dict
+        Dictionary with key "frequencies", an astropy Table with one row
+        per frequency and the columns 'num' (number of the independent
+        frequency, from 1), 'harmonic' (0 for the independent frequency,
+        ``k`` for the frequency ``(k + 1) * f``), 'frequency' (uHz),
+        'amplitude' and 'phase'. Independent frequencies that were not found
+        have NaN frequency and amplitude. This is the format consumed by
+        ``stlearn.utils.get_periods``.
+    """
+    time, flux = get_time_flux(lc)
+    flux_err = getattr(lc, "flux_err", None)
+    if flux_err is None and not isinstance(lc, tuple):
+        array = np.asarray(lc)
+        if array.ndim == 2 and array.shape[1] > 2:
+            flux_err = array[:, 2]
+    flux_err = getattr(flux_err, "value", flux_err)
+
+    finite = np.isfinite(time) & np.isfinite(flux)
+    if flux_err is not None:
+        flux_err = np.asarray(flux_err, dtype=np.float64)
+        finite &= np.isfinite(flux_err) & (flux_err > 0)
+    rows = []
+
+    if finite.sum() > 3:
+        time = (time[finite] - time[finite].min()) * _DAY
+        residuals = flux[finite] - np.mean(flux[finite])
+        weights = np.ones_like(time)
+        if flux_err is not None:
+            weights = 1 / flux_err[finite]
+            weights /= np.median(weights)
+
+        cadence = np.median(np.diff(np.sort(time))) / _DAY
+        baseline = time.max() / _DAY
+        if cadence > 0 and baseline > 0:
+            grid = frequency_grid(cadence, baseline, oversampling)
+            rows = _prewhiten(
+                time,
+                residuals,
+                weights,
+                grid,
+                n_peaks,
+                n_harmonics,
+                snr_threshold,
+            )
+
+    return {"frequencies": _frequency_table(rows, n_peaks)}
+
+
+def _prewhiten(
+    time, residuals, weights, grid, n_peaks, n_harmonics, snr_threshold
+):
+    """Iterative prewhitening, returns rows (num, harmonic, freq, amp, ph)."""
+    step = grid[0]
+    # peaks closer than this to an extracted frequency are not resolved
+    resolution = 1 / (time.max() - time.min())
+    fundamentals = []
+    rows = []
+
+    # every independent frequency may also produce a harmonic peak
+    for _ in range(n_peaks * (n_harmonics + 1)):
+        if len(fundamentals) >= n_peaks or len(grid) == 0:
+            break
+
+        spectrum = _amplitude_spectrum(time, residuals, grid)
+        noise = np.median(spectrum)
+        peak = np.argmax(spectrum)
+        if noise <= 0 or spectrum[peak] / noise < snr_threshold:
+            break
+
+        frequency = _refine_frequency(
+            time, residuals, weights, grid[peak], step
+        )
+        amplitude, phase, model = _fit_sinusoid(
+            time, residuals, weights, frequency
+        )
+        residuals = residuals - model
+
+        # leakage of an extracted frequency, removed but not kept
+        extracted = np.array([row[2] for row in rows])
+        if np.any(np.abs(extracted - frequency) < resolution):
+            continue
+
+        tag = _harmonic_tag(frequency, fundamentals, step)
+        if tag is not None:
+            rows.append(tag + (frequency, amplitude, phase))
+            continue
+
+        fundamentals.append(frequency)
+        num = len(fundamentals)
+        rows.append((num, 0, frequency, amplitude, phase))
+
+        for harmonic in range(1, n_harmonics + 1):
+            harmonic_frequency = (harmonic + 1) * frequency
+            if harmonic_frequency > grid[-1]:
+                break
+
+            amplitude, phase, model = _fit_sinusoid(
+                time, residuals, weights, harmonic_frequency
+            )
+            if amplitude / noise < snr_threshold:
+                continue
+
+            residuals = residuals - model
+            rows.append((num, harmonic, harmonic_frequency, amplitude, phase))
+
+    return rows
+
+
+def _harmonic_tag(frequency, fundamentals, step):
+    """(num, harmonic) of a peak at a multiple of a fundamental, or None."""
+    for num, fundamental in enumerate(fundamentals, start=1):
+        ratio = np.round(frequency / fundamental)
+        if ratio >= 2 and abs(frequency - ratio * fundamental) <= (
+            ratio * step
+        ):
+            return num, int(ratio) - 1
+
+    return None
+
+
+def _frequency_table(rows, n_peaks):
+    """Table of frequencies sorted by number and harmonic, NaN padded."""
+    found = {row[0] for row in rows}
+    rows = list(rows) + [
+        (num, 0, np.nan, np.nan, np.nan)
+        for num in range(1, n_peaks + 1)
+        if num not in found
+    ]
+    rows.sort(key=lambda row: (row[0], row[1]))
+
+    table = Table(
+        rows=rows or None,
+        names=("num", "harmonic", "frequency", "amplitude", "phase"),
+        dtype=(np.int64, np.int64, np.float64, np.float64, np.float64),
+    )
+    # frequencies are fitted in Hz
+    table["frequency"] = table["frequency"] * 1e6
+    table["frequency"].unit = a_units.uHz
+    table["phase"].unit = a_units.rad
+    return table
+
+
+def _extract_task(task):
+    lc, kwargs = task
+    return extract_frequencies(lc, **kwargs)
+
+
+def batch_extract_frequencies(
+    sequences, backend="process", n_jobs: int = None, chunksize=None, **kwargs
+) -> list:
+    """
+    Extract the dominant frequencies of many light curves in parallel.
+
+    Parameters
+    ----------
+    sequences : list or RaggedArray
+        Light curves as arrays of shape (n_timestamps, n_features) whose
+        features are the time (days), the flux and optionally the flux
+        error.
+    backend : str or stlearn.parallel.Executor, default: "process"
+        Execution backend, see ``stlearn.parallel``.
+    n_jobs : int, optional, default: None
+        Number of workers of a new backend.
+    chunksize : int, optional, default: None
+        Number of light curves sent to a worker at once.
+    **kwargs
+        Arguments passed to ``extract_frequencies``.
+
+    Returns
+    -------
+    list
+        Dictionary with the frequency table of each light curve, see
+        ``extract_frequencies``.
+    """
+    tasks = [(np.asarray(seq), kwargs) for seq in sequences]
+    with open_executor(backend, n_workers=n_jobs) as executor:
+        return executor.map(_extract_task, tasks, chunksize=chunksize)
@@ -1,9 +1,24 @@
 """ Module to handle general input/output operations. """
 
+import os
+import re
 import pickle
+import warnings
+import numpy as np
 
+from io import BytesIO
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
 
-__all__ = ["save_pickle", "load_pickle"]
+
+__all__ = [
+    "save_pickle",
+    "load_pickle",
+    "read_lightcurve",
+    "parse_lightcurve",
+    "download_file",
+]
 
 
 def save_pickle(obj, path, protocol=pickle.HIGHEST_PROTOCOL):
@@ -38,3 +53,201 @@ def load_pickle(path):
         obj = pickle.load(handle)
 
     return obj
+
+
+def read_lightcurve(path, n_columns=3, comments="#"):
+    """
+    Read a whitespace-delimited light curve text file.
+
+    Thin wrapper around ``numpy.loadtxt``, whose C parser is the fastest
+    reader of the small text files the stellar datasets are made of (see
+    ``benchmarks/bench_read_lightcurve.py``), that checks the number of
+    columns.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path of the text file.
+    n_columns : int, optional, default: 3
+        Number of columns of the file (time, flux and flux error).
+    comments : str, optional, default: "#"
+        Character that starts a comment. Use None if the file has no
+        comments.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n_timestamps, n_columns).
+    """
+    return _load_lightcurve(path, n_columns, comments, name=path)
+
+
+def parse_lightcurve(buffer, n_columns=3, comments="#", name="<buffer>"):
+    """
+    Parse the content of a whitespace-delimited light curve text file.
+
+    Parameters
+    ----------
+    buffer : bytes
+        Content of the file.
+    n_columns : int, optional, default: 3
+        Number of columns of the file (time, flux and flux error).
+    comments : str, optional, default: "#"
+        Character that starts a comment. Use None if the file has no
+        comments.
+    name : str, optional, default: "<buffer>"
+        Name of the file used in error messages.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n_timestamps, n_columns).
+    """
+    return _load_lightcurve(BytesIO(buffer), n_columns, comments, name=name)
+
+
+def _load_lightcurve(source, n_columns, comments, name):
+    """Load a light curve with numpy.loadtxt, checking its columns."""
+    with warnings.catch_warnings():
+        # empty files are valid light curves without timestamps
+        warnings.filterwarnings("ignore", "loadtxt: input contained no data")
+        try:
+            values = np.loadtxt(source, comments=comments, ndmin=2)
+        except ValueError as error:
+            msg = "Could not parse '{}': {}".format(name, error)
+            raise ValueError(msg) from None
+
+    if values.size == 0:
+        return np.empty((0, n_columns))
+
+    if values.shape[1] != n_columns:
+        msg = "File '{}' does not have {} columns.".format(name, n_columns)
+        raise ValueError(msg)
+
+    return values
+
+
+def download_file(
+    url, path, chunk_size=1 << 20, progress=None, resume=True, timeout=60
+):
+    """
+    Stream a remote file to disk.
+
+    The file is written in chunks to ``<path>.part`` and renamed to ``path``
+    once complete, so memory usage does not depend on the file size. If a
+    previous download was interrupted, it is resumed with an HTTP Range
+    request; servers that do not support ranges send the whole file again.
+
+    The ETag (or Last-Modified date) of the first response is stored in
+    ``<path>.part.validator`` and sent back as ``If-Range`` when resuming, so
+    the server sends the whole file again if it changed in the meantime.
+    Partial files without a validator are downloaded again from scratch.
+
+    Parameters
+    ----------
+    url : str
+        URL of the file.
+    path : str or Path
+        Destination of the file. If it already exists, nothing is downloaded.
+    chunk_size : int, optional, default: 1 MiB
+        Number of bytes read from the connection at once.
+    progress : callable, optional, default: None
+        Function called as ``progress(downloaded, total)`` after each chunk,
+        where ``total`` is the size in bytes of the file or None if the
+        server did not report it.
+    resume : bool, optional, default: True
+        Whether to resume an interrupted download.
+    timeout : float, optional, default: 60
+        Timeout in seconds of the connection.
+
+    Returns
+    -------
+    pathlib.Path
+        Path of the downloaded file.
+    """
+    path = Path(path)
+    if path.is_file():
+        return path
+
+    partial = path.with_name(path.name + ".part")
+    validator_path = path.with_name(path.name + ".part.validator")
+
+    request, start = _download_request(url, partial, validator_path, resume)
+    try:
+        response = urlopen(request, timeout=timeout)
+    except HTTPError as error:
+        # the partial file already holds the whole content
+        if error.code == 416 and start > 0:
+            os.replace(partial, path)
+            validator_path.unlink()
+            return path
+        raise
+
+    with response:
+        if response.status != 206:
+            # the server ignored the range or the file changed, start over
+            start = 0
+            # truncate first, old bytes never get the new validator
+            open(partial, "wb").close()
+            _save_validator(response, validator_path)
+
+        total = _get_total_size(response, start)
+        downloaded = start
+        with open(partial, "ab") as handle:
+            for chunk in iter(lambda: response.read(chunk_size), b""):
+                handle.write(chunk)
+                downloaded += len(chunk)
+                if progress is not None:
+                    progress(downloaded, total)
+
+    if total is not None and downloaded != total:
+        msg = "Incomplete download of '{}': got {} of {} bytes.".format(
+            url, downloaded, total
+        )
+        raise IOError(msg)
+
+    os.replace(partial, path)
+    if validator_path.is_file():
+        validator_path.unlink()
+    return path
+
+
+def _download_request(url, partial, validator_path, resume):
+    """Request of a download, with the range of the missing bytes if any."""
+    request = Request(url)
+    if not (resume and partial.is_file() and validator_path.is_file()):
+        return request, 0
+
+    start = partial.stat().st_size
+    if start > 0:
+        request.add_header("Range", "bytes={}-".format(start))
+        request.add_header("If-Range", validator_path.read_text())
+
+    return request, start
+
+
+def _save_validator(response, validator_path):
+    """Store the strong ETag or Last-Modified date of a response."""
+    validator = response.headers.get("ETag")
+    if validator is None or validator.startswith("W/"):
+        validator = response.headers.get("Last-Modified")
+
+    if validator is not None:
+        validator_path.write_text(validator)
+    elif validator_path.is_file():
+        validator_path.unlink()
+
+
+def _get_total_size(response, start):
+    """Size of the whole file from the headers of a (partial) response."""
+    content_range = response.headers.get("Content-Range")
+    if content_range is not None:
+        match = re.match(r"bytes \d+-\d+/(\d+)", content_range)
+        if match is not None:
+            return int(match.group(1))
+
+    length = response.headers.get("Content-Length")
+    if length is not None:
+        return start + int(length)
+
+    return None
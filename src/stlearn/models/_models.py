@@ -6,9 +6,19 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 
 from stlearn.models.base import ModelBase
+from stlearn.parallel import Executor, default_n_workers
 from mlens.ensemble import SuperLearner as SPRL
 
 
+# mlens backend used for each stlearn execution backend
+_MLENS_BACKENDS = {
+    "serial": "threading",
+    "thread": "threading",
+    "process": "multiprocessing",
+    "cluster": "multiprocessing",
+}
+
+
 class SuperLearner(ModelBase):
     """
     Parameters
@@ -22,20 +32,52 @@ class SuperLearner(ModelBase):
         Since those predictions are out-of-sample, the scores represent valid
         test scores. The scorer should be a function that accepts an array of
         true values and an array of
+    backend : str or stlearn.parallel.Executor, optional, default: None
+        Execution backend used to fit the layers. Only its kind and number
+        of workers are used, since mlens manages its own workers. If None,
+        mlens defaults are used.
+    n_jobs : int, optional, default: None
+        Number of workers when backend is given by name. If None, the number
+        of CPUs available to the process is used.
     """
 
-    def __init__(self, n_folds=2, scorer=None) -> None:
+    def __init__(self, n_folds=2, scorer=None, backend=None, n_jobs=None):
         super().__init__()
 
-        self.model = SPRL(folds=n_folds, scorer=scorer)
+        self.model = SPRL(
+            folds=n_folds,
+            scorer=scorer,
+            **_mlens_parallel_kwargs(backend, n_jobs),
+        )
         self.model.add(RandomForestClassifier())
         self.model.add(LogisticRegression())
         self.model.add_meta(MLPClassifier())
 
     def fit(self, X, y):
+        self._set_features(X)
         self.model.fit(X, y)
         self.__fitted__ = True
 
     def predict_class(self, X):
         self._check_fitted()
-        return self.model.predict_class(X)
+        return self.model.predict_class(self.select_features(X))
+
+
+def _mlens_parallel_kwargs(backend, n_jobs) -> dict:
+    """Translate an stlearn execution backend into mlens arguments."""
+    if backend is None:
+        return {}
+
+    if isinstance(backend, Executor):
+        backend, n_jobs = backend.kind, backend.n_workers
+
+    if backend not in _MLENS_BACKENDS:
+        msg = "Unknown backend '{}'.".format(backend)
+        raise ValueError(msg)
+
+    if backend == "serial":
+        n_jobs = 1
+    elif n_jobs is None:
+        n_jobs = default_n_workers()
+
+    return {"backend": _MLENS_BACKENDS[backend], "n_jobs": n_jobs}
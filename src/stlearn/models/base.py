@@ -2,6 +2,7 @@
 Base class to build models under stellar-learn framework.
 """
 from stlearn import io
+from tsfresh.feature_extraction.settings import from_columns
 
 
 class ModelBase:
@@ -17,6 +18,10 @@ class ModelBase:
         self.__fitted__ = False
         self.model = None
 
+        # filled when fitted on a DataFrame of features
+        self.feature_columns = None
+        self.extraction_settings = None
+
     def fit(self, X, y):
         """Fit the algorithm.
 
@@ -35,11 +40,70 @@ class ModelBase:
     def predict_class(self, X):
         raise NotImplementedError()
 
+    def select_features(self, X):
+        """Select the columns the model was fitted on, in the same order.
+
+        Parameters
+        ----------
+        X : pandas.DataFrame or numpy.array
+            Features. Arrays are returned unchanged.
+
+        Returns
+        -------
+        pandas.DataFrame or numpy.array
+        """
+        if self.feature_columns is None or not hasattr(X, "columns"):
+            return X
+
+        missing = [col for col in self.feature_columns if col not in X]
+        if missing:
+            msg = "Missing {} feature columns, e.g. '{}'.".format(
+                len(missing), missing[0]
+            )
+            raise ValueError(msg)
+
+        return X[self.feature_columns]
+
     def save_model(self, path):
-        io.save_pickle(obj=self.model, path=path)
+        io.save_pickle(
+            obj={
+                "model": self.model,
+                "fitted": self.__fitted__,
+                "feature_columns": self.feature_columns,
+                "extraction_settings": self.extraction_settings,
+            },
+            path=path,
+        )
 
     def load_model(self, path):
-        self.model = io.load_pickle(path=path)
+        obj = io.load_pickle(path=path)
+        if not (isinstance(obj, dict) and "model" in obj):
+            # models saved before the features were stored with them
+            obj = {"model": obj}
+
+        self.model = obj["model"]
+        self.__fitted__ = obj.get("fitted", self.__fitted__)
+        self.feature_columns = obj.get("feature_columns")
+        self.extraction_settings = obj.get("extraction_settings")
+
+    def _set_features(self, X):
+        """Store the feature columns of X and how to extract them.
+
+        ``extraction_settings`` are the minimal tsfresh
+        ``kind_to_fc_parameters`` that compute exactly these columns, to be
+        passed to ``StellarDataset.as_tsfresh``. They are None if X is not a
+        DataFrame or some of its columns are not tsfresh features.
+        """
+        if not hasattr(X, "columns"):
+            self.feature_columns = None
+            self.extraction_settings = None
+            return
+
+        self.feature_columns = list(X.columns)
+        try:
+            self.extraction_settings = from_columns(self.feature_columns)
+        except (TypeError, ValueError):
+            self.extraction_settings = None
 
     def _check_fitted(self):
         if not self.__fitted__:
@@ -0,0 +1,528 @@
+"""
+Execution backends used to parallelize the heavy stages of the library.
+
+Every stage that can run in parallel (reading datasets, extracting features,
+fitting models) accepts a ``backend`` argument, which can be either the name
+of a backend or an already created :class:`Executor`:
+
+* ``"serial"``: run everything in the calling process.
+* ``"thread"``: pool of threads.
+* ``"process"``: pool of processes.
+* ``"cluster"``: local cluster of worker processes fed through bounded
+  queues, so the amount of pending work in memory is limited.
+
+``imap_unordered`` reads its iterable lazily on every backend, keeping a
+rolling set of at most a few chunks per worker in flight.
+"""
+import os
+import queue
+import itertools
+import multiprocessing
+
+from functools import partial
+from contextlib import contextmanager
+from multiprocessing.pool import Pool, ThreadPool
+from multiprocessing.reduction import ForkingPickler
+from tsfresh.utilities.distribution import IterableDistributorBaseClass
+
+
+__all__ = [
+    "Executor",
+    "SerialExecutor",
+    "ThreadExecutor",
+    "ProcessExecutor",
+    "ClusterExecutor",
+    "ExecutorDistributor",
+    "default_n_workers",
+    "get_executor",
+    "open_executor",
+]
+
+
+def default_n_workers() -> int:
+    """
+    Number of CPUs the current process is allowed to run on.
+
+    Unlike ``os.cpu_count``, this takes the CPU affinity of the process into
+    account (e.g. when it has been pinned with ``taskset`` or a container
+    limits the available cores).
+
+    Returns
+    -------
+    int
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def _get_chunksize(n_tasks: int, n_workers: int) -> int:
+    """Chunk size heuristic used by multiprocessing.Pool.map."""
+    chunksize, extra = divmod(n_tasks, n_workers * 4)
+    if extra:
+        chunksize += 1
+
+    return max(chunksize, 1)
+
+
+class Executor:
+    """Base class of execution backends.
+
+    Parameters
+    ----------
+    n_workers : int, optional, default: None
+        Number of workers. If None, the number of CPUs available to the
+        process is used.
+    """
+
+    kind = None
+
+    def __init__(self, n_workers: int = None) -> None:
+        if n_workers is None:
+            n_workers = default_n_workers()
+        if n_workers < 1:
+            raise ValueError("'n_workers' must be a positive integer.")
+
+        self.n_workers = n_workers
+
+    def map(self, func, iterable, chunksize: int = None) -> list:
+        """
+        Apply the function to each element of the iterable.
+
+        Parameters
+        ----------
+        func : callable
+            Function to apply. It must be picklable for process based
+            backends.
+        iterable : iterable
+            Elements to process.
+        chunksize : int, optional, default: None
+            Number of elements sent to a worker at once. If None, a heuristic
+            is used.
+
+        Returns
+        -------
+        list
+            Results in the same order as the input.
+        """
+        raise NotImplementedError
+
+    def imap_unordered(self, func, iterable, chunksize: int = 1):
+        """
+        Lazily apply the function to each element of the iterable.
+
+        Parameters
+        ----------
+        func : callable
+            Function to apply. It must be picklable for process based
+            backends.
+        iterable : iterable
+            Elements to process.
+        chunksize : int, optional, default: 1
+            Number of elements sent to a worker at once.
+
+        Returns
+        -------
+        iterator
+            Results in completion order.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the workers of the executor."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return "{}(n_workers={})".format(type(self).__name__, self.n_workers)
+
+
+class SerialExecutor(Executor):
+    """Run every task in the calling process."""
+
+    kind = "serial"
+
+    def __init__(self, n_workers: int = None) -> None:
+        super().__init__(n_workers=1)
+
+    def map(self, func, iterable, chunksize: int = None) -> list:
+        return list(map(func, iterable))
+
+    def imap_unordered(self, func, iterable, chunksize: int = 1):
+        return map(func, iterable)
+
+
+class _PoolExecutor(Executor):
+    """Executor backed by a lazily created multiprocessing pool."""
+
+    _pool_class = None
+
+    def __init__(self, n_workers: int = None) -> None:
+        super().__init__(n_workers=n_workers)
+        self._pool = None
+        # chunks in flight in imap_unordered, as in ClusterExecutor
+        self.queue_size = 2 * self.n_workers
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = self._pool_class(self.n_workers)
+
+        return self._pool
+
+    def map(self, func, iterable, chunksize: int = None) -> list:
+        return self.pool.map(func, iterable, chunksize=chunksize)
+
+    def imap_unordered(self, func, iterable, chunksize: int = 1):
+        # Pool.imap_unordered reads the whole iterable upfront, so chunks
+        # are submitted one by one as the previous ones complete
+        done = queue.SimpleQueue()
+        pending = 0
+        for chunk in _partition(iterable, chunksize):
+            if pending >= self.queue_size:
+                pending -= 1
+                yield from _get_completed(done)
+
+            self.pool.apply_async(
+                _apply_chunk,
+                (func, chunk),
+                callback=lambda results: done.put((True, results)),
+                error_callback=lambda error: done.put((False, error)),
+            )
+            pending += 1
+
+        while pending > 0:
+            pending -= 1
+            yield from _get_completed(done)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+class ThreadExecutor(_PoolExecutor):
+    """Run tasks in a pool of threads.
+
+    Useful when tasks release the GIL (numpy kernels, I/O).
+    """
+
+    kind = "thread"
+    _pool_class = ThreadPool
+
+
+class ProcessExecutor(_PoolExecutor):
+    """Run tasks in a pool of processes."""
+
+    kind = "process"
+    _pool_class = Pool
+
+
+class ClusterExecutor(Executor):
+    """Local cluster of worker processes fed through bounded queues.
+
+    Chunks of work are sent to long-lived worker processes through a task
+    queue. At most ``queue_size`` chunks are pending at any time, so
+    iterables of arbitrary size (e.g. generators reading from disk) are
+    consumed at the pace of the workers instead of being materialized
+    upfront.
+
+    Parameters
+    ----------
+    n_workers : int, optional, default: None
+        Number of worker processes. If None, the number of CPUs available to
+        the process is used.
+    queue_size : int, optional, default: None
+        Maximum number of pending chunks. If None, twice the number of
+        workers is used.
+
+    Notes
+    -----
+    Chunks are pickled in the calling process, so errors pickling them are
+    raised there. If a worker process dies, all workers are terminated and
+    a RuntimeError is raised; the next call starts new workers.
+    """
+
+    kind = "cluster"
+
+    # seconds between checks that the workers are alive
+    poll_interval = 0.1
+
+    def __init__(self, n_workers: int = None, queue_size: int = None) -> None:
+        super().__init__(n_workers=n_workers)
+
+        if queue_size is None:
+            queue_size = 2 * self.n_workers
+        if queue_size < 1:
+            raise ValueError("'queue_size' must be a positive integer.")
+
+        self.queue_size = queue_size
+        self._workers = []
+        self._tasks = None
+        self._results = None
+
+    def _start(self) -> None:
+        if self._workers:
+            return
+
+        ctx = multiprocessing.get_context()
+        self._tasks = ctx.Queue(maxsize=self.queue_size)
+        self._results = ctx.Queue()
+        for _ in range(self.n_workers):
+            worker = ctx.Process(
+                target=_cluster_worker,
+                args=(self._tasks, self._results),
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _run(self, func, iterable, chunksize: int):
+        """Yield (chunk index, results) of each chunk in completion order."""
+        self._start()
+
+        chunks = enumerate(_partition(iterable, chunksize))
+        pending = 0
+        try:
+            for index, chunk in chunks:
+                # keep the number of chunks in flight bounded
+                if pending >= self.queue_size:
+                    pending -= 1
+                    yield self._get_result()
+
+                # pickle here, the queue would drop unpicklable chunks
+                payload = bytes(ForkingPickler.dumps((func, chunk)))
+                self._tasks.put((index, payload))
+                pending += 1
+
+            while pending > 0:
+                pending -= 1
+                yield self._get_result()
+        finally:
+            # drain results of an abandoned run so the next one is clean
+            while pending > 0 and self._workers:
+                pending -= 1
+                try:
+                    self._get_result()
+                except Exception:
+                    # a dead worker also empties ``self._workers``
+                    pass
+
+    def _get_result(self):
+        while True:
+            try:
+                result = self._results.get(timeout=self.poll_interval)
+                break
+            except queue.Empty:
+                dead = [w for w in self._workers if not w.is_alive()]
+                if dead:
+                    self._terminate()
+                    msg = "A worker process died unexpectedly (exit code {})."
+                    raise RuntimeError(msg.format(dead[0].exitcode))
+
+        index, success, value = ForkingPickler.loads(result)
+        if not success:
+            raise value
+
+        return index, value
+
+    def _terminate(self) -> None:
+        """Kill the workers, their pending work is lost."""
+        for worker in self._workers:
+            worker.terminate()
+        for worker in self._workers:
+            worker.join()
+
+        self._workers = []
+        for q in (self._tasks, self._results):
+            q.cancel_join_thread()
+            q.close()
+        self._tasks = None
+        self._results = None
+
+    def map(self, func, iterable, chunksize: int = None) -> list:
+        if chunksize is None:
+            iterable = list(iterable)
+            chunksize = _get_chunksize(len(iterable), self.n_workers)
+
+        chunks = dict(self._run(func, iterable, chunksize))
+        return list(
+            itertools.chain.from_iterable(
+                chunks[index] for index in range(len(chunks))
+            )
+        )
+
+    def imap_unordered(self, func, iterable, chunksize: int = 1):
+        for _, results in self._run(func, iterable, chunksize):
+            yield from results
+
+    def close(self) -> None:
+        if not self._workers:
+            return
+
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+
+        self._workers = []
+        self._tasks.close()
+        self._results.close()
+        self._tasks = None
+        self._results = None
+
+
+def _partition(iterable, chunksize: int):
+    """Split an iterable into lists of length chunksize."""
+    iterator = iter(iterable)
+    return iter(lambda: list(itertools.islice(iterator, chunksize)), [])
+
+
+def _apply_chunk(func, chunk) -> list:
+    return [func(item) for item in chunk]
+
+
+def _get_completed(done) -> list:
+    """Results of the next completed chunk of a pool."""
+    success, value = done.get()
+    if not success:
+        raise value
+
+    return value
+
+
+def _cluster_worker(tasks, results) -> None:
+    """Main loop of a ClusterExecutor worker process."""
+    for task in iter(tasks.get, None):
+        index, payload = task
+        try:
+            func, chunk = ForkingPickler.loads(payload)
+            result = (index, True, [func(item) for item in chunk])
+        except Exception as error:
+            result = (index, False, error)
+
+        # pickle here, the queue would drop unpicklable results
+        try:
+            result = ForkingPickler.dumps(result)
+        except Exception as error:
+            error = RuntimeError(
+                "Result of chunk {} could not be pickled: {!r}".format(
+                    index, error
+                )
+            )
+            result = ForkingPickler.dumps((index, False, error))
+        results.put(bytes(result))
+
+
+_EXECUTORS = {
+    executor.kind: executor
+    for executor in (
+        SerialExecutor,
+        ThreadExecutor,
+        ProcessExecutor,
+        ClusterExecutor,
+    )
+}
+
+
+def get_executor(backend="process", n_workers: int = None) -> Executor:
+    """
+    Get an execution backend.
+
+    Parameters
+    ----------
+    backend : str or Executor, optional, default: "process"
+        Name of the backend ("serial", "thread", "process" or "cluster") or an
+        executor, which is returned as is.
+    n_workers : int, optional, default: None
+        Number of workers of a new backend. If None, the number of CPUs
+        available to the process is used.
+
+    Returns
+    -------
+    Executor
+    """
+    if isinstance(backend, Executor):
+        return backend
+
+    if backend not in _EXECUTORS:
+        msg = "Unknown backend '{}'. Available backends are: {}.".format(
+            backend, ", ".join(_EXECUTORS)
+        )
+        raise ValueError(msg)
+
+    return _EXECUTORS[backend](n_workers=n_workers)
+
+
+@contextmanager
+def open_executor(backend="process", n_workers: int = None):
+    """
+    Context manager version of :func:`get_executor`.
+
+    Executors created from a backend name are closed on exit, while given
+    executors are left open so they can be reused by the caller.
+
+    Parameters
+    ----------
+    backend : str or Executor, optional, default: "process"
+        Name of the backend or an executor.
+    n_workers : int, optional, default: None
+        Number of workers of a new backend.
+
+    Yields
+    ------
+    Executor
+    """
+    executor = get_executor(backend, n_workers=n_workers)
+    try:
+        yield executor
+    finally:
+        if executor is not backend:
+            executor.close()
+
+
+class ExecutorDistributor(IterableDistributorBaseClass):
+    """tsfresh distributor that runs feature extraction on an executor.
+
+    Parameters
+    ----------
+    executor : Executor
+        Backend used to compute the features. It is not closed by the
+        distributor.
+    disable_progressbar : bool, optional, default: False
+        Whether to hide the progress bar.
+    progressbar_title : str, optional, default: "Feature Extraction"
+        Title of the progress bar.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        disable_progressbar: bool = False,
+        progressbar_title: str = "Feature Extraction",
+    ):
+        self.executor = executor
+        self.disable_progressbar = disable_progressbar
+        self.progressbar_title = progressbar_title
+
+    def calculate_best_chunk_size(self, data_length):
+        chunk_size, extra = divmod(data_length, self.executor.n_workers * 5)
+        if extra:
+            chunk_size += 1
+
+        return max(chunk_size, 1)
+
+    def distribute(self, func, partitioned_chunks, kwargs):
+        return self.executor.imap_unordered(
+            partial(func, **kwargs), partitioned_chunks
+        )
+
+    def close(self):
+        # the lifetime of the executor is managed by its owner
+        pass
@@ -5,8 +5,52 @@ import numpy as np
 import bottleneck as bn
 import astropy.units as a_units
 
+from collections.abc import Mapping
 from scipy.stats import binned_statistic
+from stlearn.data.ragged import RaggedArray
 from stlearn.conventions import MAD_TO_SIGNMA
+from stlearn.utils._batch import (
+    batch_get_periods,
+    batch_ptp,
+    batch_rms_timescale,
+    batch_rms_timescales,
+)
+
+
+def get_time_flux(lc):
+    """
+    Get the time and flux of a light curve as plain float arrays.
+
+    Parameters
+    ----------
+    lc : lightkurve.LightCurve, numpy.ndarray or tuple
+        Light curve object with ``time`` and ``flux`` attributes, array of
+        shape (n_timestamps, n_features) whose first two features are the
+        time and the flux, or tuple (time, flux).
+
+    Returns
+    -------
+    time : numpy.ndarray
+    flux : numpy.ndarray
+    """
+    if hasattr(lc, "time") and hasattr(lc, "flux"):
+        time, flux = lc.time, lc.flux
+        # astropy Time and Quantity objects
+        time = getattr(time, "value", time)
+        flux = getattr(flux, "value", flux)
+    elif isinstance(lc, tuple):
+        time, flux = lc
+    else:
+        lc = np.asarray(lc)
+        if lc.ndim != 2 or lc.shape[1] < 2:
+            msg = "Light curve arrays must have shape (n_timestamps, >=2)."
+            raise ValueError(msg)
+        time, flux = lc[:, 0], lc[:, 1]
+
+    return (
+        np.asarray(time, dtype=np.float64),
+        np.asarray(flux, dtype=np.float64),
+    )
 
 
 def rms_timescale(lc, timescale=3600 / 86400):
@@ -15,21 +59,26 @@ def rms_timescale(lc, timescale=3600 / 86400):
 
     Parameters
     ----------
-    lc : lightkurve.TessLightCurve
-        Timeseries to calculate RMS for.
+    lc : lightkurve.TessLightCurve, numpy.ndarray, tuple or RaggedArray
+        Timeseries to calculate RMS for, in any format accepted by
+        ``get_time_flux``. A RaggedArray or a dict of them (as returned by
+        ``from_folder``) is computed in batch, see ``batch_rms_timescale``.
     timescale : float, optioanl
         Timescale to bin timeseries before calculating RMS. Default=1 hour.
 
     Returns
     -------
     float
-        Robust RMS on specified timescale.
+        Robust RMS on specified timescale. An array (or dict of arrays) for
+        batch inputs.
 
     .. codeauthor:: Rasmus Handberg <rasmush@phys.au.dk>
     """
 
-    time = np.asarray(lc.time)
-    flux = np.asarray(lc.flux)
+    if isinstance(lc, (RaggedArray, Mapping)):
+        return batch_rms_timescale(lc, timescale)
+
+    time, flux = get_time_flux(lc)
     if len(flux) == 0 or bn.allnan(flux):
         return np.nan
     if len(time) == 0 or bn.allnan(time):
@@ -66,21 +115,27 @@ def ptp(lc):
 
     Parameters
     ----------
-    lc : lightkurve.TessLightCurve
-        Lightcurve to calculate PTP for.
+    lc : lightkurve.TessLightCurve, numpy.ndarray, tuple or RaggedArray
+        Lightcurve to calculate PTP for, in any format accepted by
+        ``get_time_flux``. A RaggedArray or a dict of them (as returned by
+        ``from_folder``) is computed in batch, see ``batch_ptp``.
 
     Returns
     -------
     float
-        Robust PTP.
+        Robust PTP. An array (or dict of arrays) for batch inputs.
 
     .. codeauthor:: Rasmus Handberg <rasmush@phys.au.dk>
     """
-    if len(lc.flux) == 0 or bn.allnan(lc.flux):
+    if isinstance(lc, (RaggedArray, Mapping)):
+        return batch_ptp(lc)
+
+    time, flux = get_time_flux(lc)
+    if len(flux) == 0 or bn.allnan(flux):
         return np.nan
-    if len(lc.time) == 0 or bn.allnan(lc.time):
+    if len(time) == 0 or bn.allnan(time):
         raise ValueError("Invalid time-vector specified. No valid timestamps.")
-    return bn.nanmedian(np.abs(np.diff(lc.flux)))
+    return bn.nanmedian(np.abs(np.diff(flux)))
 
 
 def get_periods(featdict, nfreqs, time, in_days=True, ignore_harmonics=False):
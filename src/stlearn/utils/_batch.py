@@ -0,0 +1,350 @@
+"""
+Batch versions of the utility functions, computed for a whole collection of
+light curves at once over a single concatenated buffer.
+"""
+import numpy as np
+import bottleneck as bn
+import astropy.units as a_units
+
+from collections.abc import Mapping
+from stlearn.conventions import MAD_TO_SIGNMA
+from stlearn.data.ragged import RaggedArray, segment_mad
+
+
+def _time_range(ragged: RaggedArray):
+    """Minimum and maximum timestamp of each sequence, NaN if empty."""
+    n = len(ragged)
+    time_min = np.full(n, np.nan)
+    time_max = np.full(n, np.nan)
+
+    lengths = ragged.lengths
+    nonempty = lengths > 0
+    if nonempty.any():
+        time = ragged.time
+        starts = (ragged.offsets[:-1] - ragged.offsets[0])[nonempty]
+        with np.errstate(invalid="ignore"):
+            time_min[nonempty] = np.fmin.reduceat(time, starts)
+            time_max[nonempty] = np.fmax.reduceat(time, starts)
+
+    return time_min, time_max
+
+
+def _bin_numbers(time, segments, time_min, time_max, timescale):
+    """Bin of each timestamp with the edges of ``rms_timescale``.
+
+    The edges of a curve are ``numpy.arange(time_min, time_max, timescale)``
+    followed by ``time_max``, and a timestamp goes in the last bin whose left
+    edge it reaches, as with ``scipy.stats.binned_statistic``. Edges are
+    rebuilt the way ``numpy.arange`` fills them, ``start + i * step`` with
+    ``step = (start + timescale) - start``, so they match bit for bit on
+    large time offsets where rounding moves them.
+    """
+    start = time_min[segments]
+    stop = time_max[segments]
+    step = (start + timescale) - start
+    last_bin = np.ceil((stop - start) / timescale) - 1
+
+    def edge(bins):
+        return np.where(bins > last_bin, stop, start + bins * step)
+
+    bins = np.clip(np.floor((time - start) / step), 0, last_bin)
+    # the estimate is off by at most a bin next to an edge
+    while True:
+        low = time < edge(bins)
+        high = (bins < last_bin) & (time >= edge(bins + 1))
+        if not (low.any() or high.any()):
+            return bins
+        bins = bins - low + high
+
+
+def batch_rms_timescale(sequences, timescale=3600 / 86400) -> np.ndarray:
+    """
+    Compute robust RMS on specified timescale for many light curves at once.
+
+    Batch equivalent of ``stlearn.utils.rms_timescale``, see
+    ``batch_rms_timescales``.
+
+    Parameters
+    ----------
+    sequences : list, RaggedArray or dict
+        Light curves as arrays of shape (n_timestamps, n_features) whose
+        first two features are the time and the flux, or a dictionary of
+        them such as the one returned by ``from_folder``.
+    timescale : float, optional
+        Timescale to bin timeseries before calculating RMS. Default=1 hour.
+
+    Returns
+    -------
+    numpy.ndarray or dict
+        Robust RMS on specified timescale of each light curve, NaN for curves
+        without flux. A dictionary with the same keys for dictionary inputs.
+    """
+    if isinstance(sequences, Mapping):
+        return {
+            key: batch_rms_timescale(value, timescale)
+            for key, value in sequences.items()
+        }
+
+    return batch_rms_timescales(sequences, [timescale])[:, 0]
+
+
+def batch_rms_timescales(sequences, timescales) -> np.ndarray:
+    """
+    Compute robust RMS on several timescales for many light curves at once.
+
+    Curves are validated and their finite points sorted by curve and time a
+    single time. For every timescale, the points of each bin are then a
+    contiguous run of the sorted buffer, so all bin means of the collection
+    are computed with one ``numpy.add.reduceat`` and no Python call per bin
+    or per curve. Bins match those of ``stlearn.utils.rms_timescale``.
+
+    Parameters
+    ----------
+    sequences : list, RaggedArray or dict
+        Light curves as arrays of shape (n_timestamps, n_features) whose
+        first two features are the time and the flux, or a dictionary of
+        them such as the one returned by ``from_folder``.
+    timescales : array-like
+        Timescales to bin timeseries before calculating RMS.
+
+    Returns
+    -------
+    numpy.ndarray or dict
+        Array of shape (n_sequences, n_timescales) with the robust RMS of each
+        light curve on each timescale, NaN for curves without flux. A
+        dictionary with the same keys for dictionary inputs.
+    """
+    if isinstance(sequences, Mapping):
+        return {
+            key: batch_rms_timescales(value, timescales)
+            for key, value in sequences.items()
+        }
+
+    ragged = RaggedArray.from_sequences(sequences, n_features=2)
+    return _rms_timescales(ragged, timescales, strict=True)
+
+
+def _rms_timescales(ragged: RaggedArray, timescales, strict: bool):
+    """Robust RMS of ``batch_rms_timescales`` for a ragged array.
+
+    Curves with flux but no time span raise a ValueError if ``strict``, and
+    get NaN otherwise.
+    """
+    timescales = np.atleast_1d(np.asarray(timescales, dtype=np.float64))
+    n = len(ragged)
+    segments = ragged.segment_ids
+    time = ragged.time
+    flux = ragged.flux
+
+    has_flux = np.bincount(segments[~np.isnan(flux)], minlength=n) > 0
+    time_min, time_max = _time_range(ragged)
+
+    invalid = has_flux & ~(
+        np.isfinite(time_min)
+        & np.isfinite(time_max)
+        & (time_max - time_min > 0)
+    )
+    if strict and invalid.any():
+        msg = "Invalid time-vector specified for light curves: {}.".format(
+            np.flatnonzero(invalid).tolist()
+        )
+        raise ValueError(msg)
+    has_flux &= ~invalid
+
+    rms = np.full((n, len(timescales)), np.nan)
+
+    valid = np.isfinite(flux) & np.isfinite(time) & has_flux[segments]
+    if not valid.any():
+        return rms
+
+    segments = segments[valid]
+    time = time[valid]
+    flux = flux[valid]
+    # light curves are usually stored sorted by time already
+    if np.any((time[1:] < time[:-1]) & (segments[1:] == segments[:-1])):
+        order = np.lexsort((time, segments))
+        segments, time, flux = segments[order], time[order], flux[order]
+
+    new_segment = np.diff(segments) != 0
+
+    for k, timescale in enumerate(timescales):
+        bins = _bin_numbers(time, segments, time_min, time_max, timescale)
+
+        starts = np.flatnonzero((np.diff(bins) != 0) | new_segment) + 1
+        starts = np.concatenate(([0], starts))
+        counts = np.diff(np.append(starts, len(flux)))
+        flux_bin = np.add.reduceat(flux, starts) / counts
+
+        rms[:, k] = MAD_TO_SIGNMA * segment_mad(
+            flux_bin, segments[starts], n
+        )
+
+    rms[~has_flux] = np.nan
+    return rms
+
+
+def batch_ptp(sequences) -> np.ndarray:
+    """
+    Compute robust Point-To-Point scatter for many light curves at once.
+
+    Batch equivalent of ``stlearn.utils.ptp``. Differences between
+    consecutive points are taken in a single pass over the concatenated
+    buffer, and the median of each curve is a partial selection over its
+    own slice of the differences, so the differences that cross the boundary
+    between two curves are never used.
+
+    Parameters
+    ----------
+    sequences : list, RaggedArray or dict
+        Light curves as arrays of shape (n_timestamps, n_features) whose
+        first two features are the time and the flux, or a dictionary of
+        them such as the one returned by ``from_folder``.
+
+    Returns
+    -------
+    numpy.ndarray or dict
+        Robust PTP of each light curve, in the order of the sequences (and so
+        of the ids returned by ``get_ids``). NaN for curves without flux. A
+        dictionary with the same keys for dictionary inputs.
+    """
+    if isinstance(sequences, Mapping):
+        return {key: batch_ptp(value) for key, value in sequences.items()}
+
+    ragged = RaggedArray.from_sequences(sequences, n_features=2)
+    time = ragged.time
+    flux = ragged.flux
+
+    # difference j is between points j and j + 1 of the buffer, so the
+    # differences of a curve are those from its start to its end minus one
+    diffs = np.diff(flux)
+    np.abs(diffs, out=diffs)
+    bounds = (ragged.offsets - ragged.offsets[0]).tolist()
+
+    result = np.full(len(ragged), np.nan)
+    invalid = []
+    for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if stop == start or bn.allnan(flux[start:stop]):
+            continue
+        if bn.allnan(time[start:stop]):
+            invalid.append(i)
+        elif stop - start > 1:
+            result[i] = bn.nanmedian(diffs[start:stop - 1])
+
+    if invalid:
+        msg = "Invalid time-vector specified for light curves: {}.".format(
+            invalid
+        )
+        raise ValueError(msg)
+
+    return result
+
+
+def _table_columns(tables):
+    """Concatenated frequency (uHz), amplitude and harmonic of the tables."""
+    scales = {}
+    lengths = np.empty(len(tables), dtype=np.int64)
+    frequency, amplitude, harmonic = [], [], []
+
+    for i, tab in enumerate(tables):
+        column = tab["frequency"]
+        unit = getattr(column, "unit", None)
+        if unit not in scales:
+            scales[unit] = 1.0 if unit is None else unit.to(a_units.uHz)
+
+        lengths[i] = len(tab)
+        frequency.append(np.asarray(column, dtype=np.float64) * scales[unit])
+        amplitude.append(np.asarray(tab["amplitude"], dtype=np.float64))
+        harmonic.append(np.asarray(tab["harmonic"]))
+
+    if len(tables) == 0:
+        return lengths, np.empty(0), np.empty(0), np.empty(0)
+
+    return (
+        lengths,
+        np.concatenate(frequency),
+        np.concatenate(amplitude),
+        np.concatenate(harmonic),
+    )
+
+
+def batch_get_periods(
+    featdicts, nfreqs, time, in_days=True, ignore_harmonics=False
+):
+    """
+    Cut the frequency data of many stars down to the desired number of
+    frequencies (in uHz), optionally as periods in days.
+
+    Batch equivalent of ``stlearn.utils.get_periods``. The frequency tables
+    are concatenated once, and selection, unit conversion and padding are
+    done for all stars at once on plain float arrays.
+
+    Parameters
+    ----------
+    featdicts : list
+        Dictionary with a "frequencies" table of each star, see
+        ``stlearn.features.extract_frequencies``.
+    nfreqs : int
+        Number of frequencies/periods to extract.
+    time : RaggedArray, list or numpy.ndarray
+        Light curves of the stars, their time arrays, or the time baseline of
+        each star in days. Missing frequencies are padded with the baseline
+        (as a frequency when ``in_days`` is False).
+    in_days : bool, optional
+        Return periods in days instead of frequencies in uHz.
+    ignore_harmonics : bool, optional
+        Sort frequency table by amplitude (i.e. ignore into harmonic
+        structure).
+
+    Returns
+    -------
+    periods : numpy.ndarray
+        Array of shape (n_stars, nfreqs).
+    n_usedfreqs : numpy.ndarray
+        Number of true periods/frequencies used for each star.
+    """
+    tables = [featdict["frequencies"] for featdict in featdicts]
+    n = len(tables)
+
+    if isinstance(time, RaggedArray):
+        time_min, time_max = _time_range(time)
+        baseline = time_max - time_min
+    else:
+        baseline = np.array(
+            [np.max(t) - np.min(t) if np.ndim(t) else t for t in time],
+            dtype=np.float64,
+        )
+    if len(baseline) != n:
+        raise ValueError("'time' must have one entry per star.")
+
+    lengths, frequency, amplitude, harmonic = _table_columns(tables)
+    segments = np.repeat(np.arange(n), lengths)
+
+    keep = ~np.isnan(amplitude)
+    if not ignore_harmonics:
+        keep &= harmonic == 0
+    index = np.flatnonzero(keep)
+
+    if ignore_harmonics:
+        # descending amplitude within each star, as Table.sort(reverse=True)
+        order = np.lexsort((-np.arange(len(index)), -amplitude[index]))
+        order = order[np.argsort(segments[index][order], kind="stable")]
+        index = index[order]
+
+    segments = segments[index]
+    counts = np.bincount(segments, minlength=n)
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(len(index)) - np.repeat(starts, counts)
+    selected = rank < nfreqs
+
+    with np.errstate(divide="ignore"):
+        if in_days:
+            values = 1e6 / frequency[index] / 86400
+            fill = baseline
+        else:
+            values = frequency[index]
+            fill = 1e6 / (baseline * 86400)
+
+    periods = np.repeat(fill[:, np.newaxis], nfreqs, axis=1)
+    periods[segments[selected], rank[selected]] = values[selected]
+
+    return periods, np.minimum(counts, nfreqs)
@@ -0,0 +1,94 @@
+import os
+import pytest
+import threading
+import numpy as np
+
+from io import BytesIO
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from stlearn.conventions import KeplerQ9, get_types
+
+
+TYPES = get_types(KeplerQ9)
+
+
+def make_curve(rng, length):
+    time = np.sort(rng.uniform(0, 30, size=length))
+    flux = rng.normal(scale=100, size=length)
+    flux_err = np.abs(rng.normal(scale=10, size=length))
+    return np.column_stack((time, flux, flux_err))
+
+
+@pytest.fixture
+def kepler_folder(tmp_path):
+    """Synthetic KeplerQ9-shaped dataset with a few curves per class."""
+    rng = np.random.default_rng(0)
+    folder = tmp_path / "keplerq9"
+    for ty in TYPES:
+        (folder / ty).mkdir(parents=True)
+        for i in range(3):
+            curve = make_curve(rng, rng.integers(5, 50))
+            np.savetxt(folder / ty / "{}_{}.txt".format(ty, i), curve)
+
+    return folder
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler with support for 'Range: bytes=start-'.
+
+    Ranges are ignored when an 'If-Range' header does not match the
+    Last-Modified date of the file.
+    """
+
+    requested_ranges = []
+
+    def send_head(self):
+        header = self.headers.get("Range")
+        self.requested_ranges.append(header)
+        if header is None:
+            return super().send_head()
+
+        path = self.translate_path(self.path)
+        last_modified = self.date_time_string(os.stat(path).st_mtime)
+        if self.headers.get("If-Range", last_modified) != last_modified:
+            return super().send_head()
+
+        with open(path, "rb") as handle:
+            content = handle.read()
+
+        start = int(header.split("=")[1].rstrip("-"))
+        if start >= len(content):
+            self.send_error(416)
+            return None
+
+        self.send_response(206)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.send_header(
+            "Content-Range",
+            "bytes {}-{}/{}".format(start, len(content) - 1, len(content)),
+        )
+        self.end_headers()
+        return BytesIO(content[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Serve the 'served' folder of tmp_path, yielding (url, folder)."""
+    folder = tmp_path / "served"
+    folder.mkdir()
+    handler = partial(RangeRequestHandler, directory=str(folder))
+    RangeRequestHandler.requested_ranges = []
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}".format(server.server_port), folder
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,587 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from io import BytesIO
+from zipfile import BadZipFile, ZipFile
+from tsfresh import extract_features
+from tsfresh.feature_extraction import MinimalFCParameters
+
+from stlearn.conventions import get_codes
+from stlearn.conventions import KeplerQ9 as keplerq9_classes
+from stlearn.data import RaggedArray
+from stlearn.data.datasets import KeplerQ9, LazyCollection
+from stlearn.data.datasets import _archive, _features
+from stlearn.data.datasets._archive import index_archive
+from stlearn.parallel import open_executor
+
+
+def test_from_folder_writes_and_reads_cache(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, n_processes=2)
+    ids = dataset.get_ids(kepler_folder)
+
+    assert (kepler_folder / KeplerQ9.CACHE_FOLDER).is_dir()
+
+    cached = KeplerQ9()
+    cached_collection = cached.from_folder(kepler_folder, n_processes=2)
+
+    assert cached.get_ids(kepler_folder) == ids
+    for ty in KeplerQ9.TYPES:
+        assert len(cached_collection[ty]) == len(collection[ty])
+        for seq, cached_seq in zip(collection[ty], cached_collection[ty]):
+            assert isinstance(cached_seq.base, np.memmap)
+            np.testing.assert_array_equal(seq, cached_seq)
+
+        expected = np.loadtxt(kepler_folder / ty / ids[ty][0], ndmin=2)
+        np.testing.assert_array_equal(cached_collection[ty][0], expected)
+
+
+def test_from_folder_refreshes_stale_cache(kepler_folder):
+    ty = KeplerQ9.TYPES[0]
+    collection = KeplerQ9().from_folder(kepler_folder, backend="serial")
+    n_curves = len(collection[ty])
+
+    curve = np.loadtxt(kepler_folder / ty / os.listdir(kepler_folder / ty)[0])
+    np.savetxt(kepler_folder / ty / "new.txt", curve[:3])
+
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, backend="serial")
+    assert len(collection[ty]) == n_curves + 1
+    assert "new.txt" in dataset.get_ids(kepler_folder)[ty]
+    np.testing.assert_array_equal(
+        collection[ty][dataset.get_ids(kepler_folder)[ty].index("new.txt")],
+        curve[:3],
+    )
+    assert isinstance(
+        KeplerQ9().from_folder(kepler_folder)[ty][0].base, np.memmap
+    )
+
+
+def test_from_folder_unwritable_cache(kepler_folder, tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+
+    expected = KeplerQ9().from_folder(kepler_folder, cache=False)
+    with pytest.warns(UserWarning, match="Could not write"):
+        collection = KeplerQ9().from_folder(
+            kepler_folder, cache_dir=blocker / "cache", backend="serial"
+        )
+    for ty in KeplerQ9.TYPES:
+        for seq, expected_seq in zip(collection[ty], expected[ty]):
+            np.testing.assert_array_equal(seq, expected_seq)
+
+
+def test_from_folder_matches_ids(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, n_processes=3, cache=False)
+    ids = dataset.get_ids(kepler_folder)
+
+    assert not (kepler_folder / KeplerQ9.CACHE_FOLDER).exists()
+    assert list(collection) == KeplerQ9.TYPES
+    for ty in KeplerQ9.TYPES:
+        for name, seq in zip(ids[ty], collection[ty]):
+            expected = np.loadtxt(kepler_folder / ty / name)
+            np.testing.assert_array_equal(seq, expected)
+
+
+def test_from_folder_backends(kepler_folder):
+    expected = KeplerQ9().from_folder(kepler_folder, backend="serial")
+
+    for backend in ("thread", "cluster"):
+        collection = KeplerQ9().from_folder(
+            kepler_folder, cache=False, backend=backend, n_processes=2
+        )
+        for ty in KeplerQ9.TYPES:
+            for seq, expected_seq in zip(collection[ty], expected[ty]):
+                np.testing.assert_array_equal(seq, expected_seq)
+
+
+def test_download(http_server, tmp_path, kepler_folder):
+    url, folder = http_server
+    with ZipFile(folder / "keplerq9.zip", "w") as zfile:
+        for path in kepler_folder.rglob("*.txt"):
+            zfile.write(path, path.relative_to(kepler_folder))
+
+    dataset = KeplerQ9()
+    dataset._url = url + "/keplerq9.zip"
+    dataset._temp = tmp_path / "temp"
+    extracted = dataset.download()
+
+    assert dataset.archive_path.is_file()
+    assert extracted == dataset._temp / "keplerq9"
+    for ty in KeplerQ9.TYPES:
+        assert sorted(os.listdir(extracted / ty)) == sorted(
+            os.listdir(kepler_folder / ty)
+        )
+
+
+def test_download_corrupt_archive(http_server, tmp_path):
+    url, folder = http_server
+    (folder / "keplerq9.zip").write_bytes(b"not a zip archive")
+
+    dataset = KeplerQ9()
+    dataset._url = url + "/keplerq9.zip"
+    dataset._temp = tmp_path / "temp"
+    with pytest.raises(BadZipFile):
+        dataset.download()
+    assert not dataset.archive_path.exists()
+
+
+def test_download_without_extracting(http_server, tmp_path, kepler_folder):
+    url, folder = http_server
+    with ZipFile(folder / "keplerq9.zip", "w") as zfile:
+        for path in kepler_folder.rglob("*.txt"):
+            zfile.write(path, path.relative_to(kepler_folder))
+
+    dataset = KeplerQ9()
+    dataset._url = url + "/keplerq9.zip"
+    dataset._temp = tmp_path / "temp"
+    assert dataset.download(extract=False) == dataset.archive_path
+    assert os.listdir(dataset._temp) == ["keplerq9.zip"]
+
+    collection = dataset.from_folder(dataset.archive_path, backend="serial")
+    expected = KeplerQ9().from_folder(kepler_folder, cache=False)
+    for ty in KeplerQ9.TYPES:
+        for seq, expected_seq in zip(collection[ty], expected[ty]):
+            np.testing.assert_array_equal(seq, expected_seq)
+
+
+def test_from_archive(kepler_folder, tmp_path):
+    archive = tmp_path / "keplerq9.zip"
+    with ZipFile(archive, "w") as zfile:
+        for path in kepler_folder.rglob("*.txt"):
+            zfile.write(path, path.relative_to(kepler_folder.parent))
+
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(archive, backend="thread", n_processes=2)
+    ids = dataset.get_ids(archive)
+
+    assert (tmp_path / ("keplerq9" + KeplerQ9.CACHE_FOLDER)).is_dir()
+    assert KeplerQ9().get_ids(archive) == ids
+    for ty in KeplerQ9.TYPES:
+        assert sorted(ids[ty]) == sorted(os.listdir(kepler_folder / ty))
+        for name, seq in zip(ids[ty], collection[ty]):
+            expected = np.loadtxt(kepler_folder / ty / name)
+            np.testing.assert_array_equal(seq, expected)
+
+
+def write_archive(folder, archive, shift=0.0):
+    tmp = archive.with_name(archive.name + ".tmp")
+    with ZipFile(tmp, "w") as zfile:
+        for path in sorted(folder.rglob("*.txt")):
+            buffer = BytesIO()
+            np.savetxt(buffer, np.loadtxt(path, ndmin=2) + shift)
+            zfile.writestr(str(path.relative_to(folder)), buffer.getvalue())
+    os.replace(tmp, archive)
+
+
+def read_own_handle(source):
+    curve = _archive.read_member(*source)
+    owner, _ = _archive._HANDLES[str(source[0])]
+    return curve, owner[0] == os.getpid()
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_from_archive_replaced(kepler_folder, tmp_path, cache):
+    archive = tmp_path / "keplerq9.zip"
+    write_archive(kepler_folder, archive)
+    before = KeplerQ9().from_folder(archive, cache=cache, backend="serial")
+
+    write_archive(kepler_folder, archive, shift=1.0)
+    after = KeplerQ9().from_folder(archive, cache=cache, backend="serial")
+    for ty in KeplerQ9.TYPES:
+        for seq, old in zip(after[ty], before[ty]):
+            np.testing.assert_array_equal(seq, old + 1.0)
+
+
+def test_read_member_after_fork(kepler_folder, tmp_path):
+    archive = tmp_path / "keplerq9.zip"
+    write_archive(kepler_folder, archive)
+
+    # the parent holds an open handle when the workers are forked
+    dataset = KeplerQ9()
+    dataset.from_folder(archive, cache=False, backend="serial")
+    members = index_archive(archive, KeplerQ9.TYPES)
+    sources = [(archive, name) for ty in members for name in members[ty]]
+    expected = [_archive.read_member(*source) for source in sources]
+
+    with open_executor("process", n_workers=4) as executor:
+        results = executor.map(read_own_handle, sources * 20, chunksize=1)
+    for k, (curve, own_handle) in enumerate(results):
+        np.testing.assert_array_equal(curve, expected[k % len(sources)])
+        assert own_handle
+
+
+def test_lazy_from_folder(kepler_folder):
+    expected = KeplerQ9().from_folder(kepler_folder, cache=False)
+
+    dataset = KeplerQ9()
+    collection = dataset.lazy_from_folder(kepler_folder, max_bytes=1000)
+    assert isinstance(collection, LazyCollection)
+    assert dataset.get_data_collection() is collection
+    assert list(collection) == KeplerQ9.TYPES
+
+    for ty in KeplerQ9.TYPES:
+        assert len(collection[ty]) == len(expected[ty])
+        for seq, expected_seq in zip(collection[ty], expected[ty]):
+            np.testing.assert_array_equal(seq, expected_seq)
+        np.testing.assert_array_equal(collection[ty][-1], expected[ty][-1])
+
+    assert collection.misses == 3 * len(KeplerQ9.TYPES)
+    assert collection.hits == len(KeplerQ9.TYPES)
+    assert collection.cache_bytes <= max(1000, collection[ty][-1].nbytes)
+
+
+def test_from_folder_lazy_mode_mismatch(kepler_folder):
+    dataset = KeplerQ9()
+    dataset.from_folder(kepler_folder, cache=False, backend="serial")
+    with pytest.raises(ValueError, match="from_folder"):
+        dataset.lazy_from_folder(kepler_folder)
+
+    dataset = KeplerQ9()
+    dataset.lazy_from_folder(kepler_folder)
+    with pytest.raises(ValueError, match="lazy_from_folder"):
+        dataset.from_folder(kepler_folder)
+
+
+def test_from_folder_ragged(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+
+    for ty in KeplerQ9.TYPES:
+        assert isinstance(collection[ty], RaggedArray)
+
+    padded = dataset.pad_collection(collection)
+    for ty in KeplerQ9.TYPES:
+        assert padded[ty].shape == (3, collection[ty].lengths.max(), 3)
+
+
+def loop_as_dataframe(collection, id_dict):
+    """Reference long-format frame built one DataFrame per curve."""
+    frames = []
+    for key in collection:
+        for i, seq in enumerate(collection[key]):
+            df = pd.DataFrame(seq, columns=["time", "flux", "flux_error"])
+            df["id"] = id_dict[key][i].replace(".txt", "")
+            df["type"] = key
+            frames.append(df)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_as_dataframe(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    ids = dataset.get_ids(kepler_folder)
+
+    df = dataset.as_dataframe(collection)
+    pd.testing.assert_frame_equal(df, loop_as_dataframe(collection, ids))
+
+
+def test_as_dataframe_categorical(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    ids = dataset.get_ids(kepler_folder)
+
+    df = dataset.as_dataframe(collection, categorical=True, type_codes=True)
+    expected = loop_as_dataframe(collection, ids)
+
+    assert isinstance(df["id"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["type"].dtype, pd.CategoricalDtype)
+    assert df["type"].cat.categories.tolist() == KeplerQ9.TYPES
+    np.testing.assert_array_equal(df["id"].astype(object), expected["id"])
+    np.testing.assert_array_equal(df["type"].astype(object), expected["type"])
+
+    codes = get_codes(keplerq9_classes)
+    assert dataset.get_type_codes() == codes
+    np.testing.assert_array_equal(
+        df["type_code"], expected["type"].map(codes)
+    )
+    assert df["type_code"].dtype == np.uint8
+
+
+def test_as_tsfresh_chunked_cache(kepler_folder, tmp_path, monkeypatch):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    dataset.get_ids(kepler_folder)
+    long_format = dataset.as_dataframe(collection, type_codes=True)
+
+    settings = MinimalFCParameters()
+    kwargs = dict(
+        settings=settings, chunk_size=4, cache_dir=tmp_path / "features"
+    )
+    expected = extract_features(
+        long_format.drop(columns=["type", "type_code"]),
+        column_id="id",
+        column_sort="time",
+        default_fc_parameters=settings,
+        n_jobs=0,
+        disable_progressbar=True,
+    )
+
+    features = KeplerQ9().as_tsfresh(
+        long_format, backend="thread", n_jobs=2, **kwargs
+    )
+    pd.testing.assert_frame_equal(features, expected, check_like=True)
+
+    extracted = []
+
+    def counting_extract(chunk, **kw):
+        extracted.extend(chunk["id"].unique())
+        return extract_features(chunk, **kw)
+
+    monkeypatch.setattr(_features, "extract_features", counting_extract)
+
+    # a restart only reads the cache
+    features = KeplerQ9().as_tsfresh(long_format, **kwargs)
+    pd.testing.assert_frame_equal(features, expected, check_like=True)
+    assert extracted == []
+
+    # only the modified curve is recomputed
+    changed = long_format["id"] == expected.index[0]
+    long_format.loc[changed, "flux"] += 1
+    features = KeplerQ9().as_tsfresh(long_format, **kwargs)
+    assert extracted == [expected.index[0]]
+    pd.testing.assert_frame_equal(
+        features.iloc[1:], expected.iloc[1:], check_like=True
+    )
+
+
+def test_feature_cache(tmp_path, monkeypatch):
+    cache = _features.FeatureCache(tmp_path, "settings")
+    cache.write(pd.DataFrame({"f": [1.0, 2.0]}, index=["a:1", "b:1"]))
+    cache.write(pd.DataFrame({"f": [3.0]}, index=["c:1"]))
+    cache.write(pd.DataFrame({"f": [4.0]}, index=["a:2"]))
+
+    read = []
+    read_pickle = pd.read_pickle
+
+    def counting_read(path):
+        read.append(path)
+        return read_pickle(path)
+
+    monkeypatch.setattr(pd, "read_pickle", counting_read)
+
+    # only the chunks holding the keys are read
+    cache = _features.FeatureCache(tmp_path, "settings")
+    loaded = cache.load(["c:1", "a:2", "d:1"])
+    assert loaded["f"].to_dict() == {"c:1": 3.0, "a:2": 4.0}
+    assert len(read) == 2
+
+    # superseded rows are dropped, emptied chunks are deleted
+    cache.write(pd.DataFrame({"f": [5.0]}, index=["c:2"]))
+    cache.compact()
+    assert len(list(cache.path.glob("*.pkl"))) == 3
+    loaded = _features.FeatureCache(tmp_path, "settings").load()
+    assert loaded["f"].to_dict() == {"b:1": 2.0, "a:2": 4.0, "c:2": 5.0}
+
+
+def test_as_tsfresh_chunked_categorical(kepler_folder, tmp_path):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    dataset.get_ids(kepler_folder)
+    long_format = dataset.as_dataframe(collection)
+    categorical = dataset.as_dataframe(collection, categorical=True)
+
+    kwargs = dict(settings=MinimalFCParameters(), chunk_size=4)
+    expected = KeplerQ9().as_tsfresh(long_format, **kwargs)
+
+    features = KeplerQ9().as_tsfresh(
+        categorical, cache_dir=tmp_path, **kwargs
+    )
+    pd.testing.assert_frame_equal(
+        features, expected, check_like=True, check_index_type=False
+    )
+
+    # partial cache hits only extract the curves of the new ids
+    changed = categorical["id"] == expected.index[0]
+    categorical.loc[changed, "flux"] += 1
+    features = KeplerQ9().as_tsfresh(
+        categorical, cache_dir=tmp_path, **kwargs
+    )
+    unchanged = expected.index[1:]
+    pd.testing.assert_frame_equal(
+        features.loc[unchanged],
+        expected.loc[unchanged],
+        check_like=True,
+        check_index_type=False,
+    )
+
+
+def test_as_tsfresh_categorical_subset(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    dataset.get_ids(kepler_folder)
+    long_format = dataset.as_dataframe(collection)
+    categorical = dataset.as_dataframe(collection, categorical=True)
+
+    ty = KeplerQ9.TYPES[0]
+    settings = MinimalFCParameters()
+    expected = dataset.as_tsfresh(
+        long_format[long_format["type"] == ty], settings=settings
+    )
+    features = dataset.as_tsfresh(
+        categorical[categorical["type"] == ty], settings=settings
+    )
+    features.index = features.index.astype(object)
+    pd.testing.assert_frame_equal(
+        features.sort_index(), expected.sort_index(), check_like=True
+    )
+
+
+def test_as_tsfresh_collection(kepler_folder, tmp_path, monkeypatch):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    dataset.get_ids(kepler_folder)
+    long_format = dataset.as_dataframe(collection)
+
+    kwargs = dict(settings=MinimalFCParameters(), chunk_size=3)
+    expected = KeplerQ9().as_tsfresh(long_format, **kwargs)
+
+    def no_frame(*args, **kw):
+        raise AssertionError("the full frame was built")
+
+    monkeypatch.setattr(dataset, "as_dataframe", no_frame)
+    features = dataset.as_tsfresh(
+        collection, cache_dir=tmp_path, backend="thread", n_jobs=2, **kwargs
+    )
+    pd.testing.assert_frame_equal(features, expected)
+    assert dataset.as_tsfresh(collection, **kwargs) is features
+
+    # only the kinds of ``kind_settings`` are extracted
+    features = dataset.as_tsfresh(
+        collection,
+        kind_settings={"flux": {"maximum": None}},
+        cache_dir=tmp_path / "kinds",
+    )
+    assert list(features.columns) == ["flux__maximum"]
+
+    # lazy collections are read chunk by chunk
+    lazy_dataset = KeplerQ9()
+    lazy = lazy_dataset.lazy_from_folder(kepler_folder, max_bytes=1000)
+    assert isinstance(lazy, LazyCollection)
+    pd.testing.assert_frame_equal(
+        lazy_dataset.as_tsfresh(lazy, **kwargs), expected
+    )
+    assert lazy.misses > 0
+
+    # curves have the same cache keys as the rows of the frame
+    monkeypatch.setattr(_features, "extract_features", None)
+    features = KeplerQ9().as_tsfresh(
+        long_format, cache_dir=tmp_path, **kwargs
+    )
+    pd.testing.assert_frame_equal(features, expected)
+
+
+def test_collection_fingerprint_lazy(kepler_folder):
+    dataset = KeplerQ9()
+    lazy = dataset.lazy_from_folder(kepler_folder)
+    ids = dataset.get_ids(kepler_folder)
+
+    key = _features.collection_fingerprint(lazy, ids)
+    assert lazy.misses == 0
+    assert _features.collection_fingerprint(lazy, ids) == key
+
+    ty = KeplerQ9.TYPES[0]
+    with open(kepler_folder / ty / ids[ty][0], "a") as handle:
+        handle.write("1 2 3\n")
+    assert _features.collection_fingerprint(lazy, ids) != key
+
+
+def test_as_tsfresh_keyed_cache(kepler_folder, monkeypatch):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    dataset.get_ids(kepler_folder)
+    long_format = dataset.as_dataframe(collection)
+    ids = long_format["id"].unique()
+    first = long_format[long_format["id"].isin(ids[:4])]
+    second = long_format[long_format["id"].isin(ids[4:])]
+    settings = MinimalFCParameters()
+
+    features_first = dataset.as_tsfresh(first, settings=settings)
+    features_second = dataset.as_tsfresh(second, settings=settings)
+    assert set(features_first.index) == set(ids[:4])
+    assert set(features_second.index) == set(ids[4:])
+    assert len(dataset.tsfresh_cache) == 2
+
+    monkeypatch.setattr("stlearn.data.datasets.base.extract_features", None)
+    assert dataset.as_tsfresh(first, settings=settings) is features_first
+    assert dataset.tsfresh_cache.hits == 1
+
+    # budget for a single frame: the least recently used one is dropped
+    dataset.tsfresh_cache.max_bytes = dataset.tsfresh_cache.cache_bytes // 2
+    dataset.tsfresh_cache.put("other", features_second)
+    assert len(dataset.tsfresh_cache) == 1
+    assert "other" in dataset.tsfresh_cache
+
+
+def test_as_features(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    dataset.get_ids(kepler_folder)
+
+    features = dataset.as_features(collection, n_periods=1)
+    long_format = dataset.as_dataframe(collection)
+
+    assert list(features.index) == list(long_format["id"].unique())
+    assert "period_1" in features
+    assert features["std"].notna().all()
+
+
+def test_bucket_collection(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+
+    seen = {ty: [] for ty in KeplerQ9.TYPES}
+    for ty, indices, padded in dataset.bucket_collection(collection, None, 2):
+        assert padded.shape[0] == len(indices)
+        seen[ty].extend(indices)
+    for ty in KeplerQ9.TYPES:
+        assert sorted(seen[ty]) == [0, 1, 2]
+
+    report = dataset.padding_report(collection, n_buckets=2)
+    assert list(report.index) == KeplerQ9.TYPES
+    assert (report["after"] <= report["before"]).all()
+
+
+def test_resample_collection(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+
+    resampled = dataset.resample_collection(collection, cadence=1.0)
+    shapes = {resampled[ty].shape for ty in KeplerQ9.TYPES}
+    assert len(shapes) == 1
+    assert shapes.pop()[::2] == (3, 3)
+
+
+def lightcurve_length(lightcurve):
+    return len(lightcurve.flux)
+
+
+def test_iter_lightkurve(kepler_folder):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    ids = dataset.get_ids(kepler_folder)
+
+    lightcurves = dataset.iter_lightkurve(collection)
+    ty, id, lightcurve = next(lightcurves)
+    assert (ty, id) == (KeplerQ9.TYPES[0], ids[ty][0].replace(".txt", ""))
+    np.testing.assert_array_equal(
+        lightcurve.flux.value, collection[ty][0][:, 1]
+    )
+
+    lk_dict = dataset.as_lightkurve(collection)
+    assert [len(lk_dict[ty]) for ty in KeplerQ9.TYPES] == [3] * 8
+
+    expected = {
+        (ty, id.replace(".txt", "")): len(seq)
+        for ty in KeplerQ9.TYPES
+        for id, seq in zip(ids[ty], collection[ty])
+    }
+    for backend in ("serial", "cluster"):
+        results = dataset.iter_lightkurve(
+            collection, func=lightcurve_length, backend=backend, n_jobs=2
+        )
+        assert {(ty, id): n for ty, id, n in results} == expected
@@ -0,0 +1,165 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from scipy import stats
+from stlearn.data import RaggedArray
+from stlearn.features import (
+    batch_extract_frequencies,
+    extract_frequencies,
+    extract_stellar_features,
+    frequency_grid,
+)
+from stlearn.utils import get_periods, ptp, rms_timescale
+
+
+def make_pulsator(period, amplitude=50.0, n=3000, seed=0):
+    """Non-sinusoidal pulsator (with a first harmonic) sampled every 30 min."""
+    rng = np.random.default_rng(seed)
+    time = np.arange(n) / 48
+    phase = 2 * np.pi * time / period
+    flux = (
+        amplitude * np.sin(phase)
+        + amplitude / 3 * np.sin(2 * phase + 0.4)
+        + rng.normal(scale=2.0, size=n)
+    )
+    return np.column_stack((time, flux, np.full(n, 2.0)))
+
+
+def test_frequency_grid_cached():
+    grid = frequency_grid(1 / 48, 62.5)
+    assert grid is frequency_grid(1 / 48 + 1e-9, 62.5)
+    assert not grid.flags.writeable
+    np.testing.assert_allclose(grid[-1], 1 / 3600, rtol=1e-3)
+
+
+def test_extract_frequencies_get_periods():
+    curve = make_pulsator(period=2.5)
+    featdict = extract_frequencies(curve, n_peaks=3)
+    table = featdict["frequencies"]
+
+    assert table.colnames == [
+        "num", "harmonic", "frequency", "amplitude", "phase"
+    ]
+    assert str(table["frequency"].unit) == "uHz"
+
+    main = table[(table["num"] == 1) & (table["harmonic"] == 0)][0]
+    np.testing.assert_allclose(main["amplitude"], 50, rtol=0.02)
+    first_harmonic = table[(table["num"] == 1) & (table["harmonic"] == 1)]
+    assert len(first_harmonic) == 1
+
+    periods, n_used, used = get_periods(featdict, 3, curve[:, 0])
+    np.testing.assert_allclose(periods[0], 2.5, rtol=0.01)
+    assert len(periods) == 3
+    assert n_used == len(used)
+
+
+def test_extract_frequencies_close_peaks():
+    rng = np.random.default_rng(0)
+    time = np.arange(3000) / 48
+    frequencies = np.array([2.5, 7.13])
+    # uHz to cycles per day
+    arg = 2 * np.pi * frequencies[:, np.newaxis] * 0.0864 * time
+    flux = (
+        50 * np.sin(arg[0])
+        + 20 * np.sin(arg[1] + 1)
+        + rng.normal(scale=2.0, size=len(time))
+    )
+    table = extract_frequencies(np.column_stack((time, flux)), n_peaks=4)[
+        "frequencies"
+    ]
+
+    # off-grid peaks are refined and their leakage is not a new frequency
+    fundamentals = table[table["harmonic"] == 0]["frequency"]
+    np.testing.assert_allclose(fundamentals[:2], frequencies, rtol=1e-3)
+    assert np.isnan(fundamentals[2:]).all()
+
+
+def test_extract_frequencies_noise():
+    rng = np.random.default_rng(1)
+    curve = np.column_stack((np.arange(500) / 48, rng.normal(size=500)))
+    table = extract_frequencies(curve, n_peaks=2, snr_threshold=10)[
+        "frequencies"
+    ]
+
+    assert len(table) == 2
+    assert np.isnan(table["amplitude"]).all()
+
+
+def test_batch_extract_frequencies():
+    curves = [make_pulsator(period, seed=i) for i, period in enumerate((1, 3))]
+    result = batch_extract_frequencies(curves, backend="thread", n_jobs=2)
+
+    for featdict, period in zip(result, (1, 3)):
+        periods, _, _ = get_periods(featdict, 1, [0, 62.5])
+        np.testing.assert_allclose(periods[0], period, rtol=0.01)
+
+
+def make_curves(seed=0):
+    rng = np.random.default_rng(seed)
+    curves = [
+        make_pulsator(period, n=n, seed=seed)
+        for period, n in [(0.7, 900), (2.0, 1500), (3.0, 1200)]
+    ]
+    curves[0][::9, 1] = np.nan
+    time = np.arange(200) / 48
+    curves.append(np.column_stack((time, rng.normal(size=200), np.ones(200))))
+    return curves
+
+
+def test_extract_stellar_features():
+    curves = make_curves()
+    features = extract_stellar_features(
+        curves, percentiles=[10, 50], lags=[1, 3], n_periods=1
+    )
+
+    assert len(features) == len(curves)
+    for i, curve in enumerate(curves):
+        flux = curve[:, 1]
+        finite = flux[np.isfinite(flux)]
+        row = features.iloc[i]
+
+        np.testing.assert_allclose(row["rms_1h"], rms_timescale(curve))
+        np.testing.assert_allclose(row["ptp"], ptp(curve))
+        np.testing.assert_allclose(row["std"], np.std(finite))
+        np.testing.assert_allclose(row["skew"], stats.skew(finite))
+        np.testing.assert_allclose(row["kurtosis"], stats.kurtosis(finite))
+        np.testing.assert_allclose(
+            row[["p10", "p50"]], np.percentile(finite, [10, 50])
+        )
+
+        centered = np.nan_to_num(flux - finite.mean())
+        acf = np.sum(centered[3:] * centered[:-3]) / np.sum(centered ** 2)
+        np.testing.assert_allclose(row["acf_3"], acf)
+
+    np.testing.assert_allclose(
+        features["period_1"][:3], [0.7, 2.0, 3.0], rtol=0.02
+    )
+
+
+def test_extract_stellar_features_collection():
+    curves = make_curves()
+    collection = {"a": curves[:2], "b": RaggedArray.from_sequences(curves[2:])}
+
+    result = extract_stellar_features(collection)
+    expected = extract_stellar_features(curves)
+
+    pd.testing.assert_frame_equal(
+        pd.concat(result.values(), ignore_index=True), expected
+    )
+
+
+def test_extract_stellar_features_single_timestamp():
+    curves = make_curves()
+    curves.insert(1, np.array([[0.5, 1.0, 1.0]]))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        features = extract_stellar_features(curves, n_periods=3)
+
+    assert features.loc[1, ["rms_1h", "rms_6h", "rms_24h"]].isna().all()
+    expected = extract_stellar_features(curves[:1] + curves[2:], n_periods=3)
+    pd.testing.assert_frame_equal(
+        features.drop(index=1).reset_index(drop=True), expected
+    )
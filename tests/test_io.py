@@ -0,0 +1,130 @@
+import os
+import pytest
+import numpy as np
+
+from stlearn.io import download_file, read_lightcurve
+from tests.conftest import RangeRequestHandler
+
+
+def test_read_lightcurve_matches_loadtxt(tmp_path):
+    values = np.random.default_rng(0).normal(size=(20, 3))
+    values[3, 1] = np.nan
+    path = tmp_path / "curve.txt"
+    np.savetxt(path, values, header="time flux flux_err")
+
+    np.testing.assert_array_equal(read_lightcurve(path), np.loadtxt(path))
+
+
+def test_read_lightcurve_invalid(tmp_path):
+    path = tmp_path / "curve.txt"
+    path.write_text("1 2 3\n4 5\n")
+    with pytest.raises(ValueError):
+        read_lightcurve(path)
+
+    path.write_text("1 2 3\n4 five 6\n")
+    with pytest.raises(ValueError):
+        read_lightcurve(path)
+
+    # rows that would re-flow into the right total number of values
+    path.write_text("1 2\n3 4 5 6\n")
+    with pytest.raises(ValueError):
+        read_lightcurve(path)
+    with pytest.raises(ValueError):
+        np.loadtxt(path)
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(n_bytes):
+    def progress(done, total):
+        if done >= n_bytes:
+            raise Interrupted
+
+    return progress
+
+
+def test_download_file_resumes(http_server, tmp_path):
+    url, folder = http_server
+    content = np.random.default_rng(0).bytes(10000)
+    (folder / "data.bin").write_bytes(content)
+
+    path = tmp_path / "data.bin"
+    with pytest.raises(Interrupted):
+        download_file(
+            url + "/data.bin",
+            path,
+            chunk_size=4000,
+            progress=interrupt_after(4000),
+        )
+    assert (tmp_path / "data.bin.part").read_bytes() == content[:4000]
+
+    calls = []
+    download_file(
+        url + "/data.bin",
+        path,
+        chunk_size=1024,
+        progress=lambda done, total: calls.append((done, total)),
+    )
+
+    assert path.read_bytes() == content
+    assert not (tmp_path / "data.bin.part").exists()
+    assert not (tmp_path / "data.bin.part.validator").exists()
+    assert RangeRequestHandler.requested_ranges == [None, "bytes=4000-"]
+    assert calls[0] == (5024, 10000)
+    assert calls[-1] == (10000, 10000)
+
+
+def test_download_file_changed_remote(http_server, tmp_path):
+    url, folder = http_server
+    rng = np.random.default_rng(1)
+    remote = folder / "data.bin"
+    remote.write_bytes(rng.bytes(10000))
+
+    path = tmp_path / "data.bin"
+    with pytest.raises(Interrupted):
+        download_file(
+            url + "/data.bin",
+            path,
+            chunk_size=4000,
+            progress=interrupt_after(4000),
+        )
+
+    # the remote file is replaced before the download is resumed
+    content = rng.bytes(12000)
+    remote.write_bytes(content)
+    mtime = remote.stat().st_mtime + 100
+    os.utime(remote, (mtime, mtime))
+
+    download_file(url + "/data.bin", path)
+    assert path.read_bytes() == content
+    assert RangeRequestHandler.requested_ranges == [None, "bytes=4000-"]
+
+
+def test_download_file_part_without_validator(http_server, tmp_path):
+    url, folder = http_server
+    (folder / "data.bin").write_bytes(b"new content")
+    (tmp_path / "data.bin.part").write_bytes(b"old")
+
+    path = download_file(url + "/data.bin", tmp_path / "data.bin")
+    assert path.read_bytes() == b"new content"
+    assert RangeRequestHandler.requested_ranges == [None]
+
+
+def test_download_file_complete_part(http_server, tmp_path):
+    url, folder = http_server
+    (folder / "data.bin").write_bytes(b"abc")
+    with pytest.raises(Interrupted):
+        download_file(
+            url + "/data.bin",
+            tmp_path / "data.bin",
+            progress=interrupt_after(3),
+        )
+
+    path = download_file(url + "/data.bin", tmp_path / "data.bin")
+    assert path.read_bytes() == b"abc"
+
+    # already downloaded files are not requested again
+    download_file(url + "/data.bin", path)
+    assert RangeRequestHandler.requested_ranges == [None, "bytes=3-"]
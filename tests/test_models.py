@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from sklearn.linear_model import LogisticRegression
+from tsfresh.feature_extraction import MinimalFCParameters
+from stlearn import io
+from stlearn.data.datasets import KeplerQ9
+from stlearn.models import SuperLearner
+from stlearn.models.base import ModelBase
+
+
+class LogisticModel(ModelBase):
+    def __init__(self):
+        super().__init__()
+        self.model = LogisticRegression()
+
+    def fit(self, X, y):
+        self._set_features(X)
+        self.model.fit(X, y)
+        self.__fitted__ = True
+
+    def predict_class(self, X):
+        return self.model.predict(self.select_features(X))
+
+
+def test_extraction_settings(kepler_folder, tmp_path):
+    dataset = KeplerQ9()
+    collection = dataset.from_folder(kepler_folder, cache=False)
+    dataset.get_ids(kepler_folder)
+    long_format = dataset.as_dataframe(collection)
+
+    full = dataset.as_tsfresh(long_format, settings=MinimalFCParameters())
+    columns = ["flux__maximum", "flux__mean", "flux__standard_deviation"]
+    y = np.arange(len(full)) % 2
+
+    model = LogisticModel()
+    model.fit(full[columns], y)
+    assert model.extraction_settings == {
+        "flux": {"maximum": None, "mean": None, "standard_deviation": None}
+    }
+
+    model.save_model(tmp_path / "model.pkl")
+    loaded = LogisticModel()
+    loaded.load_model(tmp_path / "model.pkl")
+    assert loaded.feature_columns == columns
+
+    minimal = KeplerQ9().as_tsfresh(
+        long_format, kind_settings=loaded.extraction_settings
+    )
+    assert sorted(minimal.columns) == columns
+    pd.testing.assert_frame_equal(
+        minimal[columns], full[columns], check_like=True
+    )
+    np.testing.assert_array_equal(
+        loaded.predict_class(minimal.iloc[:, ::-1]),
+        model.predict_class(full),
+    )
+
+
+def test_extraction_settings_non_tsfresh_columns():
+    model = LogisticModel()
+    X = pd.DataFrame({"rms": [0.0, 1.0], "flux__mean": [1.0, 0.0]})
+    model.fit(X, [0, 1])
+
+    assert model.feature_columns == ["rms", "flux__mean"]
+    assert model.extraction_settings is None
+
+
+def test_load_model_without_features(tmp_path):
+    superl = SuperLearner()
+    io.save_pickle(obj=superl.model, path=tmp_path / "model.pkl")
+
+    loaded = SuperLearner()
+    loaded.load_model(tmp_path / "model.pkl")
+    assert type(loaded.model) is type(superl.model)
+    assert loaded.feature_columns is None
@@ -0,0 +1,148 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from tsfresh import extract_features
+from tsfresh.feature_extraction import MinimalFCParameters
+from stlearn.parallel import (
+    ClusterExecutor,
+    ExecutorDistributor,
+    default_n_workers,
+    get_executor,
+    open_executor,
+)
+
+
+BACKENDS = ["serial", "thread", "process", "cluster"]
+
+
+def square(x):
+    return x * x
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError("three")
+    return x
+
+
+def exit_on_three(x):
+    if x == 3:
+        os._exit(1)
+    return x
+
+
+def return_lambda(x):
+    return lambda: x
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_executor_map(backend):
+    with open_executor(backend, n_workers=2) as executor:
+        assert executor.kind == backend
+        assert executor.map(square, range(20)) == [x * x for x in range(20)]
+        assert executor.map(square, range(7), chunksize=3) == [
+            x * x for x in range(7)
+        ]
+        results = executor.imap_unordered(square, range(20), chunksize=3)
+        assert sorted(results) == [x * x for x in range(20)]
+
+
+def test_cluster_executor_bounded_generator():
+    consumed = []
+
+    def produce():
+        for x in range(100):
+            consumed.append(x)
+            yield x
+
+    with ClusterExecutor(n_workers=2, queue_size=2) as executor:
+        results = executor.imap_unordered(square, produce())
+        next(results)
+        # only a bounded number of chunks is pulled from the generator
+        assert len(consumed) <= 3
+        results.close()
+
+        assert executor.map(square, range(5)) == [0, 1, 4, 9, 16]
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_pool_executor_bounded_generator(backend):
+    consumed = []
+
+    def produce():
+        for x in range(100):
+            consumed.append(x)
+            yield x
+
+    with open_executor(backend, n_workers=2) as executor:
+        results = executor.imap_unordered(square, produce())
+        first = next(results)
+        # a rolling set of chunks is in flight, not the whole generator
+        assert len(consumed) <= executor.queue_size + 1
+        assert sorted([first, *results]) == [x * x for x in range(100)]
+
+        with pytest.raises(ValueError, match="three"):
+            list(executor.imap_unordered(fail_on_three, range(10)))
+
+
+def test_cluster_executor_propagates_errors():
+    with ClusterExecutor(n_workers=2) as executor:
+        with pytest.raises(ValueError, match="three"):
+            executor.map(fail_on_three, range(10), chunksize=1)
+
+        assert executor.map(square, range(3)) == [0, 1, 4]
+
+
+def test_cluster_executor_does_not_hang():
+    with ClusterExecutor(n_workers=2) as executor:
+        # unpicklable tasks fail in the caller
+        with pytest.raises(Exception, match="pickle"):
+            list(executor.imap_unordered(lambda x: x, range(4)))
+
+        with pytest.raises(RuntimeError, match="pickled"):
+            executor.map(return_lambda, range(4))
+
+        with pytest.raises(RuntimeError, match="died"):
+            executor.map(exit_on_three, range(10), chunksize=1)
+
+        # new workers are started after a crash
+        assert executor.map(square, range(3)) == [0, 1, 4]
+
+
+def test_get_executor():
+    executor = get_executor("thread", n_workers=3)
+    assert get_executor(executor) is executor
+    with open_executor(executor):
+        pass
+    assert executor.map(square, [2]) == [4]
+    executor.close()
+
+    assert get_executor("process").n_workers == default_n_workers()
+    with pytest.raises(ValueError):
+        get_executor("gpu")
+
+
+def test_executor_distributor():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "id": np.repeat(["a", "b", "c"], 10),
+            "time": np.tile(np.arange(10), 3),
+            "flux": rng.normal(size=30),
+        }
+    )
+    kwargs = dict(
+        column_id="id",
+        column_sort="time",
+        default_fc_parameters=MinimalFCParameters(),
+        disable_progressbar=True,
+    )
+
+    expected = extract_features(df, n_jobs=0, **kwargs)
+    with open_executor("process", n_workers=2) as executor:
+        distributor = ExecutorDistributor(executor, disable_progressbar=True)
+        features = extract_features(df, distributor=distributor, **kwargs)
+
+    pd.testing.assert_frame_equal(features.sort_index(), expected)
@@ -0,0 +1,109 @@
+import pytest
+import numpy as np
+
+from scipy.stats import binned_statistic
+
+from stlearn.data import RaggedArray
+from stlearn.data.preprocessing import (
+    bucket_boundaries,
+    bucket_sequences,
+    pad_sequences,
+    padding_overhead,
+    resample_sequences,
+)
+
+
+def make_sequences():
+    rng = np.random.default_rng(0)
+    return [rng.normal(size=(n, 3)) for n in (4, 1, 6)]
+
+
+def test_pad_sequences():
+    sequences = make_sequences()
+    original = [sq.copy() for sq in sequences]
+
+    padded, mask = pad_sequences(sequences, return_mask=True)
+
+    assert padded.shape == (3, 6, 3)
+    np.testing.assert_array_equal(mask.sum(axis=1), [4, 1, 6])
+    for i, sq in enumerate(original):
+        np.testing.assert_array_equal(padded[i][mask[i]], sq)
+        np.testing.assert_array_equal(padded[i][~mask[i]], 0)
+        # the input is left untouched
+        np.testing.assert_array_equal(sequences[i], sq)
+
+
+def test_pad_sequences_nan_ragged_truncate():
+    sequences = make_sequences()
+    ragged = RaggedArray.from_sequences(sequences)
+
+    padded, mask = pad_sequences(
+        ragged, max_length=5, value=np.nan, return_mask=True
+    )
+
+    assert padded.shape == (3, 5, 3)
+    np.testing.assert_array_equal(mask, ~np.isnan(padded[..., 0]))
+    np.testing.assert_array_equal(padded[2], sequences[2][:5])
+    np.testing.assert_array_equal(
+        pad_sequences(ragged), pad_sequences(sequences)
+    )
+
+
+def test_bucket_sequences():
+    rng = np.random.default_rng(0)
+    sequences = [rng.normal(size=(n, 3)) for n in (3, 10, 4, 100, 9, 95)]
+
+    batches = list(bucket_sequences(sequences, boundaries=[5, 10]))
+    indices = [batch[0].tolist() for batch in batches]
+    assert indices == [[0, 2], [1, 4], [3, 5]]
+    assert [batch[1].shape[1] for batch in batches] == [4, 10, 100]
+
+    for idx, padded, mask in bucket_sequences(
+        sequences, n_buckets=3, return_mask=True
+    ):
+        for i, row, row_mask in zip(idx, padded, mask):
+            np.testing.assert_array_equal(row[row_mask], sequences[i])
+
+    lengths = [len(sq) for sq in sequences]
+    before = padding_overhead(lengths)
+    after = padding_overhead(lengths, [5, 10])
+    assert np.isclose(before, 1 - 221 / 600)
+    assert np.isclose(after, 1 - 221 / (2 * 4 + 2 * 10 + 2 * 100))
+    assert len(bucket_boundaries(lengths, 3)) == 3
+
+
+@pytest.mark.parametrize("statistic", ["mean", "median"])
+def test_resample_sequences(statistic):
+    rng = np.random.default_rng(0)
+    sequences = []
+    for n in (50, 80, 1):
+        seq = np.column_stack(
+            (
+                np.sort(rng.uniform(10, 20, size=n)),
+                rng.normal(size=n),
+                rng.normal(size=n),
+            )
+        )
+        sequences.append(seq)
+    sequences[0][3, 1] = np.nan
+
+    resampled = resample_sequences(sequences, cadence=0.5, statistic=statistic)
+
+    assert resampled.shape[:2] == (3, 20)
+    for seq, res in zip(sequences, resampled):
+        t0 = seq[0, 0]
+        edges = t0 + 0.5 * np.arange(21)
+        np.testing.assert_allclose(res[:, 0], edges[:-1] + 0.25)
+        for feature in (1, 2):
+            finite = np.isfinite(seq[:, feature])
+            expected, _, _ = binned_statistic(
+                seq[finite, 0],
+                seq[finite, feature],
+                statistic,
+                bins=edges,
+            )
+            np.testing.assert_allclose(res[:, feature], expected)
+
+    fixed = resample_sequences(sequences, cadence=1.0, n_bins=3, start=10.0)
+    assert fixed.shape == (3, 3, 3)
+    np.testing.assert_allclose(fixed[0, :, 0], [10.5, 11.5, 12.5])
@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+
+from stlearn.data import RaggedArray
+from stlearn.data.ragged import segment_median
+
+
+@pytest.fixture
+def sequences():
+    rng = np.random.default_rng(0)
+    return [rng.normal(size=(n, 3)) for n in (4, 0, 7, 2)]
+
+
+def test_ragged_array_views(sequences):
+    ragged = RaggedArray.from_sequences(sequences)
+
+    assert len(ragged) == 4
+    np.testing.assert_array_equal(ragged.lengths, [4, 0, 7, 2])
+    np.testing.assert_array_equal(
+        ragged.segment_ids, [0] * 4 + [2] * 7 + [3] * 2
+    )
+    for seq, expected in zip(ragged, sequences):
+        assert np.shares_memory(seq, ragged.values) or len(seq) == 0
+        np.testing.assert_array_equal(seq, expected)
+    np.testing.assert_array_equal(ragged[-1], sequences[-1])
+    np.testing.assert_array_equal(
+        ragged.flux, np.concatenate(sequences)[:, 1]
+    )
+
+    with pytest.raises(IndexError):
+        ragged[4]
+
+
+def test_ragged_array_slices(sequences):
+    ragged = RaggedArray.from_sequences(sequences)
+
+    sliced = ragged[2:]
+    assert isinstance(sliced, RaggedArray)
+    assert sliced.values is ragged.values
+    np.testing.assert_array_equal(sliced.lengths, [7, 2])
+    np.testing.assert_array_equal(sliced.data, np.concatenate(sequences[2:]))
+    np.testing.assert_array_equal(sliced.segment_ids, [0] * 7 + [1] * 2)
+
+    stepped = ragged[::2]
+    for seq, expected in zip(stepped, sequences[::2]):
+        np.testing.assert_array_equal(seq, expected)
+
+    assert len(ragged[3:1]) == 0
+    assert len(RaggedArray.from_sequences([], n_features=3)) == 0
+
+
+@pytest.mark.parametrize("length", [3, 200])
+def test_segment_median(length):
+    rng = np.random.default_rng(0)
+    segments = np.repeat([0, 2, 3], [length, length + 1, 1])
+    values = rng.normal(size=len(segments))
+    expected = [np.median(values[segments == i]) for i in (0, 2, 3)]
+
+    for order in (np.arange(len(values)), rng.permutation(len(values))):
+        medians = segment_median(values[order], segments[order], 5)
+        np.testing.assert_allclose(medians[[0, 2, 3]], expected)
+        assert np.isnan(medians[[1, 4]]).all()
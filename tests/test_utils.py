@@ -0,0 +1,199 @@
+import pytest
+import numpy as np
+import lightkurve as lk
+
+from types import SimpleNamespace
+from astropy import units as u
+from astropy.table import Table
+from astropy.units import cds
+from stlearn.data import RaggedArray
+from stlearn.utils import (
+    batch_get_periods,
+    batch_ptp,
+    batch_rms_timescale,
+    batch_rms_timescales,
+    get_periods,
+    ptp,
+    rms_timescale,
+)
+
+
+def make_curves(seed=0):
+    rng = np.random.default_rng(seed)
+    curves = []
+    for n in (500, 1200, 3, 800):
+        time = np.sort(rng.uniform(0, rng.uniform(2, 30), size=n))
+        flux = rng.normal(scale=rng.uniform(1, 100), size=n)
+        curves.append(np.column_stack((time, flux, np.ones(n))))
+
+    curves[0][::7, 1] = np.nan
+    curves[1][5:300, 0] += 3  # gap
+    curves[1][:, 0].sort()
+    curves.append(
+        np.column_stack((np.arange(4.0), np.full(4, np.nan), np.ones(4)))
+    )
+    return curves
+
+
+def as_lc(curve):
+    return SimpleNamespace(time=curve[:, 0], flux=curve[:, 1])
+
+
+@pytest.mark.parametrize("timescale", [3600 / 86400, 0.37, 2.0])
+def test_batch_rms_timescale(timescale):
+    curves = make_curves()
+    expected = [rms_timescale(as_lc(c), timescale) for c in curves]
+
+    result = batch_rms_timescale(RaggedArray.from_sequences(curves), timescale)
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+    assert np.isnan(result[-1])
+
+
+def test_batch_rms_timescale_regular_cadence():
+    # Kepler-like 30 min cadence with BJD offsets: timestamps fall on bin
+    # edges, where rounding decides the bin
+    rng = np.random.default_rng(2)
+    starts = np.concatenate(([2454833.0], rng.uniform(100, 2000, size=30)))
+    curves = [
+        np.column_stack((t0 + np.arange(500) / 48, rng.normal(size=500)))
+        for t0 in starts
+    ]
+
+    for timescale in (1 / 24, 3600 / 86400, 0.3):
+        expected = [rms_timescale(as_lc(c), timescale) for c in curves]
+        result = batch_rms_timescale(curves, timescale)
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+
+def test_batch_rms_timescale_invalid_time():
+    curves = make_curves()
+    curves[2][:, 0] = 1.0
+    with pytest.raises(ValueError):
+        batch_rms_timescale(curves)
+
+
+def test_batch_rms_timescales():
+    curves = make_curves(1)
+    timescales = [1 / 24, 6 / 24, 1.0]
+
+    result = batch_rms_timescales(curves, timescales)
+
+    assert result.shape == (len(curves), 3)
+    for k, timescale in enumerate(timescales):
+        expected = [rms_timescale(as_lc(c), timescale) for c in curves]
+        np.testing.assert_allclose(result[:, k], expected, rtol=1e-12)
+
+
+def test_raw_array_inputs():
+    curves = make_curves(2)
+    ragged = RaggedArray.from_sequences(curves)
+    expected_rms = [rms_timescale(as_lc(c)) for c in curves]
+    expected_ptp = [ptp(as_lc(c)) for c in curves]
+
+    for curve, rms, expected in zip(curves, expected_rms, expected_ptp):
+        np.testing.assert_allclose(rms_timescale(curve), rms)
+        np.testing.assert_allclose(
+            rms_timescale((curve[:, 0], curve[:, 1])), rms
+        )
+        np.testing.assert_allclose(ptp(curve), expected)
+
+    np.testing.assert_allclose(rms_timescale(ragged), expected_rms)
+    np.testing.assert_allclose(ptp(ragged), expected_ptp)
+
+    batch = batch_rms_timescales({"a": ragged, "b": ragged[:2]}, [0.5, 1])
+    assert batch["a"].shape == (len(curves), 2)
+    assert batch["b"].shape == (2, 2)
+    np.testing.assert_allclose(ptp({"a": ragged})["a"], expected_ptp)
+
+
+def test_lightkurve_input():
+    curve = make_curves(3)[3]
+    curve[:, 0] += 2454833
+    lc = lk.TessLightCurve(
+        time=curve[:, 0],
+        flux=curve[:, 1],
+        flux_err=curve[:, 2],
+        flux_unit=cds.ppm,
+        time_format="jd",
+    )
+
+    np.testing.assert_allclose(rms_timescale(lc), rms_timescale(curve))
+    np.testing.assert_allclose(ptp(lc), ptp(curve))
+
+
+def test_batch_ptp():
+    curves = make_curves(2)
+    curves[3][:10, 1] = np.nan
+    curves.append(np.empty((0, 3)))
+    expected = [ptp(as_lc(c)) if len(c) else np.nan for c in curves]
+
+    result = batch_ptp(curves)
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+    assert np.isnan(result[-2:]).all()
+
+    # boundaries: concatenating shifted curves must not change anything
+    shifted = [c + [0, 1e3 * i, 0] for i, c in enumerate(curves)]
+    np.testing.assert_allclose(batch_ptp(shifted), expected, rtol=1e-9)
+
+
+def test_batch_ptp_invalid_time():
+    curves = make_curves()
+    curves[2][:, 0] = np.nan
+    with pytest.raises(ValueError):
+        batch_ptp(curves)
+
+
+def make_featdicts(seed=0):
+    rng = np.random.default_rng(seed)
+    featdicts = []
+    for n_peaks in (0, 1, 3, 6):
+        rows = []
+        for num in range(1, n_peaks + 1):
+            for harmonic in range(rng.integers(0, 3)):
+                rows.append(
+                    (num, harmonic, rng.uniform(1, 50), rng.uniform(1, 9))
+                )
+            rows.append((num, 0, rng.uniform(1, 50), rng.uniform(1, 9)))
+        rows.append((n_peaks + 1, 0, np.nan, np.nan))
+        table = Table(
+            rows=rows,
+            names=("num", "harmonic", "frequency", "amplitude"),
+            dtype=(int, int, float, float),
+        )
+        table["frequency"].unit = u.uHz
+        featdicts.append({"frequencies": table})
+    return featdicts
+
+
+@pytest.mark.parametrize("in_days", [True, False])
+@pytest.mark.parametrize("ignore_harmonics", [True, False])
+def test_batch_get_periods(in_days, ignore_harmonics):
+    featdicts = make_featdicts()
+    times = [np.linspace(0, span, 10) for span in (5, 20, 30, 80)]
+
+    periods, n_used = batch_get_periods(
+        featdicts, 4, times, in_days, ignore_harmonics
+    )
+
+    assert periods.shape == (4, 4)
+    for i, featdict in enumerate(featdicts):
+        expected, expected_used, _ = get_periods(
+            featdict, 4, times[i], in_days, ignore_harmonics
+        )
+        np.testing.assert_allclose(periods[i], expected, rtol=1e-12)
+        assert n_used[i] == expected_used
+
+
+def test_batch_get_periods_ragged_time():
+    featdicts = make_featdicts(1)
+    curves = [
+        np.column_stack((np.linspace(0, span, 10), np.ones(10)))
+        for span in (5, 20, 30, 80)
+    ]
+
+    periods, _ = batch_get_periods(
+        featdicts, 2, RaggedArray.from_sequences(curves)
+    )
+    expected, _ = batch_get_periods(featdicts, 2, [5, 20, 30, 80])
+    np.testing.assert_allclose(periods, expected)
+    np.testing.assert_allclose(periods[0], 5)